@@ -0,0 +1,63 @@
+"""
+Compare parsing the hierarchy date ranges per PlaceRef with the cached copies.
+
+Run from the repository root with Gramps importable:
+
+    python GBPN/benchmarks/bench_date_ranges.py [references]
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gramps.gen.datehandler import parser  # noqa: E402
+
+from date_ranges import get_date_range  # noqa: E402
+
+PERIODS = (
+    "before 1889-01-01",
+    "from 1889-01-01 to 1974-01-01",
+    "after 1974-01-01",
+)
+
+DESCRIPTION = "Gazetteer of British Place Names (ID: %(gbpn_id)s)"
+
+
+def main() -> None:
+    references = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+
+    def parse_each():
+        for position in range(references):
+            parser.parse(PERIODS[position % 3])
+
+    def copy_cached():
+        for position in range(references):
+            get_date_range(PERIODS[position % 3])
+
+    # The URL description used to be translated and formatted for every URL
+    # compared; it is now translated once and formatted once per row.
+    def format_each():
+        for position in range(references):
+            for _url in range(3):
+                DESCRIPTION % {"gbpn_id": str(position)}
+
+    def format_once():
+        for position in range(references):
+            DESCRIPTION % {"gbpn_id": str(position)}
+
+    for label, before, after in (
+        ("Date ranges", parse_each, copy_cached),
+        ("URL descriptions", format_each, format_once),
+    ):
+        before_time = min(timeit.repeat(before, number=1, repeat=3))
+        after_time = min(timeit.repeat(after, number=1, repeat=3))
+        print(
+            f"{label}: {before_time * 1000:.1f} ms -> {after_time * 1000:.1f} ms "
+            f"for {references} references ({before_time / after_time:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Time exporting imported GBPN places and their hierarchy to CSV and GeoJSON.
+
+Run from the repository root with Gramps importable, e.g.:
+
+    python GBPN/benchmarks/bench_export.py --rows 100000
+
+The synthetic gazetteer is imported (with its hierarchy) into a temporary
+database first; that import is not part of the reported times.
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gramps.gen.db.utils import make_database  # noqa: E402
+
+from gazetteer import Gazetteer  # noqa: E402
+from importer import BULK_TRANSACTION_SIZE, PlaceImporter  # noqa: E402
+from place_export import EXPORT_FORMATS, PlaceExporter  # noqa: E402
+from synthetic import write_gazetteer  # noqa: E402
+
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    arguments.add_argument("--rows", type=int, default=20000, help="gazetteer places")
+    arguments.add_argument("--seed", type=int, default=1)
+    options = arguments.parse_args()
+
+    directory = Path(tempfile.mkdtemp(prefix="gbpn-benchmark-"))
+    db = None
+    try:
+        csv_path = directory / "GBPN.csv"
+        write_gazetteer(csv_path, options.rows, seed=options.seed)
+        gazetteer = Gazetteer(csv_path)
+
+        db = make_database("sqlite")
+        (directory / "tree").mkdir()
+        db.load(str(directory / "tree"))
+        started = time.perf_counter()
+        PlaceImporter(db).run(gazetteer.iter_rows(name_type="P"), BULK_TRANSACTION_SIZE)
+        print(
+            f"Imported {db.get_number_of_places()} place(s) "
+            f"in {time.perf_counter() - started:.2f} s"
+        )
+
+        for export_format in EXPORT_FORMATS:
+            path = directory / f"places.{export_format}"
+            exporter = PlaceExporter(db)
+            started = time.perf_counter()
+            count = exporter.write(path)
+            elapsed = time.perf_counter() - started
+            print(
+                f"{export_format}: {count} place(s) in {elapsed:.2f} s "
+                f"({count / elapsed:.0f} places/s), "
+                f"{path.stat().st_size / 1024 / 1024:.1f} MB"
+            )
+            print("  Counters:", exporter.counters)
+    finally:
+        if db is not None:
+            db.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
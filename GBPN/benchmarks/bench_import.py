@@ -0,0 +1,143 @@
+"""
+Time GBPN imports end to end on a synthetic gazetteer and a temporary database.
+
+Run from the repository root with Gramps importable, e.g.:
+
+    python GBPN/benchmarks/bench_import.py --rows 100000 --existing 20000
+    python GBPN/benchmarks/bench_import.py --rows 100000 --ids 500 --reimport
+
+Reported stages are building the gazetteer store, indexing the database places,
+reading rows from the store, and the importer's own stages (see
+``importer.STAGES``): matching rows to places, updating them, building their
+hierarchy and committing.
+"""
+
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gramps.gen.db import DbTxn  # noqa: E402
+from gramps.gen.db.utils import make_database  # noqa: E402
+from gramps.gen.lib import Place, PlaceName  # noqa: E402
+
+from gazetteer import Gazetteer  # noqa: E402
+from importer import PlaceImporter  # noqa: E402
+from synthetic import write_gazetteer  # noqa: E402
+
+
+def add_existing_places(db, count: int) -> None:
+    """
+    Fill the database with unrelated places, as in a tree that is already in use.
+    """
+    with DbTxn("Add existing places", db, batch=True) as trans:
+        for number in range(count):
+            place = Place()
+            name = PlaceName()
+            name.set_value(f"Existing {number}")
+            place.set_name(name)
+            db.add_place(place, trans)
+
+
+def report(title: str, timings: dict[str, float], rows: int = 0) -> None:
+    total = sum(timings.values())
+    print(f"\n{title}: {total:.2f} s", end="")
+    print(f", {rows} row(s) ({rows / total:.0f} rows/s)" if rows and total else "")
+    for stage, seconds in timings.items():
+        share = seconds / total * 100 if total else 0.0
+        print(f"  {stage:<10} {seconds:8.3f} s  {share:5.1f}%")
+
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    arguments.add_argument("--rows", type=int, default=20000, help="gazetteer places")
+    arguments.add_argument("--regions", type=int, default=12)
+    arguments.add_argument("--counties", type=int, default=8, help="per region")
+    arguments.add_argument("--districts", type=int, default=6, help="per county")
+    arguments.add_argument("--parishes", type=int, default=20, help="per district")
+    arguments.add_argument(
+        "--alternative-names",
+        type=float,
+        default=0.2,
+        help="share of places with alternative names",
+    )
+    arguments.add_argument(
+        "--existing", type=int, default=0, help="unrelated places already in the tree"
+    )
+    arguments.add_argument(
+        "--ids", type=int, default=0, help="import this many random IDs, not all rows"
+    )
+    arguments.add_argument(
+        "--chunk-size", type=int, default=1000, help="rows per transaction, 0 for one"
+    )
+    arguments.add_argument(
+        "--reimport", action="store_true", help="import the same rows a second time"
+    )
+    arguments.add_argument("--seed", type=int, default=1)
+    options = arguments.parse_args()
+
+    directory = Path(tempfile.mkdtemp(prefix="gbpn-benchmark-"))
+    db = None
+    try:
+        csv_path = directory / "GBPN.csv"
+        started = time.perf_counter()
+        write_gazetteer(
+            csv_path,
+            options.rows,
+            regions=options.regions,
+            counties=options.counties,
+            districts=options.districts,
+            parishes=options.parishes,
+            alternative_names=options.alternative_names,
+            seed=options.seed,
+        )
+        print(
+            f"Generated {csv_path.stat().st_size / 1e6:.1f} MB gazetteer "
+            f"in {time.perf_counter() - started:.2f} s"
+        )
+
+        db = make_database("sqlite")
+        (directory / "tree").mkdir()
+        db.load(str(directory / "tree"))
+        add_existing_places(db, options.existing)
+
+        setup = {}
+        gazetteer = Gazetteer(csv_path)
+        started = time.perf_counter()
+        gazetteer.get_rows_for_ids([])
+        setup["store"] = time.perf_counter() - started
+
+        importer = PlaceImporter(db)
+        started = time.perf_counter()
+        importer.place_index.find_by_gbpn_id("")
+        setup["index"] = time.perf_counter() - started
+        report("Setup", setup)
+
+        def read_rows():
+            if not options.ids:
+                yield from gazetteer.iter_rows(name_type="P")
+                return
+            gbpn_ids = random.Random(options.seed).sample(
+                range(1, options.rows + 1), min(options.ids, options.rows)
+            )
+            yield from gazetteer.get_rows_for_ids(map(str, gbpn_ids), name_type="P")
+
+        result = importer.run(read_rows(), options.chunk_size)
+        report("First import", result.timings, result.count)
+        if options.reimport:
+            result = importer.run(read_rows(), options.chunk_size)
+            report("Re-import", result.timings, result.count)
+        print(f"\n{db.get_number_of_places()} place(s) in the tree")
+    finally:
+        if db is not None:
+            db.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Time matching untagged places to a synthetic gazetteer, and check the matches.
+
+Run from the repository root with Gramps importable, e.g.:
+
+    python GBPN/benchmarks/bench_match.py --rows 200000 --places 20000
+
+The tree gets ``--places`` untagged places copied from random gazetteer places:
+some with their historic county in the name ("Place 12, Historic County 1-2"),
+some with coordinates a little off, and some with neither, which should not be
+matched. Reported stages are reading the places, matching them and tagging them.
+"""
+
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gramps.gen.db import DbTxn  # noqa: E402
+from gramps.gen.db.utils import make_database  # noqa: E402
+from gramps.gen.lib import Place, PlaceName  # noqa: E402
+
+from gazetteer import Gazetteer  # noqa: E402
+from importer import BULK_TRANSACTION_SIZE, PlaceImporter  # noqa: E402
+from place_matcher import PlaceMatcher, collect_untagged_places  # noqa: E402
+from synthetic import write_gazetteer  # noqa: E402
+
+
+def add_untagged_places(
+    db, gazetteer: Gazetteer, rows: int, count: int, seed: int
+) -> dict[str, str]:
+    """
+    Add untagged copies of random gazetteer places, returning their GBPN IDs by
+    handle for those that should be matched.
+    """
+    generator = random.Random(seed)
+    gbpn_ids = [str(i) for i in generator.sample(range(1, rows + 1), count)]
+    expected = {}
+    with DbTxn("Add untagged places", db, batch=True) as trans:
+        for position, row in enumerate(
+            gazetteer.get_rows_for_ids(gbpn_ids, name_type="P")
+        ):
+            place = Place()
+            name = PlaceName()
+            kind = position % 3
+            if kind == 0:
+                name.set_value(f"{row.PlaceName}, {row.HistCounty}")
+            else:
+                name.set_value(row.PlaceName)
+            place.set_name(name)
+            if kind == 1:
+                # About 100 m off
+                place.set_latitude(f"{float(row.Lat) + 0.0009:.5f}")
+                place.set_longitude(f"{float(row.Lng):.5f}")
+            db.add_place(place, trans)
+            if kind != 2:
+                expected[place.get_handle()] = row.GBPNID
+    return expected
+
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    arguments.add_argument("--rows", type=int, default=100000, help="gazetteer places")
+    arguments.add_argument(
+        "--places", type=int, default=10000, help="untagged places in the tree"
+    )
+    arguments.add_argument("--seed", type=int, default=1)
+    options = arguments.parse_args()
+
+    directory = Path(tempfile.mkdtemp(prefix="gbpn-benchmark-"))
+    db = None
+    try:
+        csv_path = directory / "GBPN.csv"
+        write_gazetteer(csv_path, options.rows, seed=options.seed)
+        gazetteer = Gazetteer(csv_path)
+        gazetteer.get_rows_for_ids([])
+
+        db = make_database("sqlite")
+        (directory / "tree").mkdir()
+        db.load(str(directory / "tree"))
+        expected = add_untagged_places(
+            db, gazetteer, options.rows, options.places, options.seed
+        )
+
+        timings = {}
+        started = time.perf_counter()
+        places = collect_untagged_places(db)
+        timings["read"] = time.perf_counter() - started
+
+        matcher = PlaceMatcher(gazetteer)
+        started = time.perf_counter()
+        matches = list(matcher.iter_matches(places))
+        timings["match"] = time.perf_counter() - started
+
+        importer = PlaceImporter(db, hierarchy_enabled=False)
+        started = time.perf_counter()
+        importer.run(
+            [match.row for match in matches],
+            BULK_TRANSACTION_SIZE,
+            places={match.row.GBPNID: match.place.handle for match in matches},
+        )
+        timings["tag"] = time.perf_counter() - started
+
+        total = sum(timings.values())
+        print(f"{len(places)} untagged place(s) in {total:.2f} s")
+        for stage, seconds in timings.items():
+            print(f"  {stage:<6} {seconds:8.3f} s")
+        print("Counters:", matcher.counters)
+
+        correct = sum(
+            expected.get(match.place.handle) == match.row.GBPNID for match in matches
+        )
+        print(
+            f"{correct} of {len(matches)} match(es) correct, "
+            f"{len(expected)} expected"
+        )
+    finally:
+        if db is not None:
+            db.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Time nearest-place and box searches on a synthetic gazetteer.
+
+Run from the repository root with Gramps importable, e.g.:
+
+    python GBPN/benchmarks/bench_spatial.py --rows 1000000
+
+Searches go through the grid of coordinates in the gazetteer store; the linear
+scan over every row that it replaces is timed once for comparison.
+"""
+
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gazetteer import Gazetteer  # noqa: E402
+from spatial import get_distance  # noqa: E402
+from synthetic import write_gazetteer  # noqa: E402
+
+# Area covered by the synthetic places, see synthetic.write_gazetteer
+SOUTH, NORTH, WEST, EAST = 50.0, 58.5, -6.0, 1.7
+
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    arguments.add_argument("--rows", type=int, default=200000, help="gazetteer places")
+    arguments.add_argument(
+        "--queries", type=int, default=1000, help="searches of each kind"
+    )
+    arguments.add_argument("--limit", type=int, default=20, help="nearest places")
+    arguments.add_argument(
+        "--box", type=float, default=0.05, help="box height and width in degrees"
+    )
+    arguments.add_argument("--seed", type=int, default=1)
+    options = arguments.parse_args()
+
+    directory = Path(tempfile.mkdtemp(prefix="gbpn-benchmark-"))
+    try:
+        csv_path = directory / "GBPN.csv"
+        write_gazetteer(csv_path, options.rows, alternative_names=0.0)
+        gazetteer = Gazetteer(csv_path)
+        started = time.perf_counter()
+        gazetteer.get_rows_for_ids([])
+        print(f"Built store in {time.perf_counter() - started:.2f} s")
+
+        generator = random.Random(options.seed)
+        positions = [
+            (generator.uniform(SOUTH, NORTH), generator.uniform(WEST, EAST))
+            for _ in range(options.queries)
+        ]
+
+        started = time.perf_counter()
+        found = 0
+        for lat, lng in positions:
+            found += len(gazetteer.find_nearest(lat, lng, options.limit))
+        elapsed = time.perf_counter() - started
+        print(
+            f"Nearest {options.limit}: {elapsed / options.queries * 1000:.3f} ms "
+            f"per search, {found / options.queries:.1f} place(s)"
+        )
+
+        started = time.perf_counter()
+        found = 0
+        for lat, lng in positions:
+            found += len(
+                gazetteer.find_in_box(lat, lng, lat + options.box, lng + options.box)
+            )
+        elapsed = time.perf_counter() - started
+        print(
+            f"Box of {options.box} degrees: "
+            f"{elapsed / options.queries * 1000:.3f} ms per search, "
+            f"{found / options.queries:.1f} place(s)"
+        )
+
+        lat, lng = positions[0]
+        started = time.perf_counter()
+        sorted(
+            (get_distance(lat, lng, float(row.Lat), float(row.Lng)), row.GBPNID)
+            for row in gazetteer.iter_rows(name_type="P")
+        )[: options.limit]
+        print(f"Linear scan: {(time.perf_counter() - started) * 1000:.1f} ms")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
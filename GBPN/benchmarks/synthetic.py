@@ -0,0 +1,86 @@
+"""
+Synthetic GBPN.csv files for benchmarks, since the real gazetteer is licensed.
+"""
+
+import csv
+import random
+from pathlib import Path
+
+HEADER = (
+    "GBPNID",
+    "PlaceName",
+    "GBPN_URL",
+    "HistCounty",
+    "AdCounty",
+    "District",
+    "UniAuth",
+    "Region",
+    "CivilParish",
+    "Alternative_Name",
+    "Type",
+    "NameType",
+    "Lat",
+    "Lng",
+)
+
+PLACE_TYPES = ("Village", "Hamlet", "Town", "Farm", "Locality")
+
+
+def write_gazetteer(
+    path: Path,
+    rows: int,
+    regions: int = 12,
+    counties: int = 8,
+    districts: int = 6,
+    parishes: int = 20,
+    alternative_names: float = 0.2,
+    seed: int = 1,
+) -> None:
+    """
+    Write a gazetteer of ``rows`` places to ``path``.
+
+    Places are spread at random over a hierarchy with the given fan-out: counties
+    per region, districts per county and parishes per district. A share of
+    ``alternative_names`` of the places gets one or two alternative names, each
+    also listed as a row of its own (``NameType`` ``A``) as in the real data.
+    """
+    generator = random.Random(seed)
+    with open(path, "w", encoding="utf-8-sig", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(HEADER)
+        for gbpn_id in range(1, rows + 1):
+            region = generator.randrange(regions)
+            county = generator.randrange(counties)
+            district = generator.randrange(districts)
+            parish = generator.randrange(parishes)
+            county_name = f"County {region}-{county}"
+            district_name = f"District {region}-{county}-{district}"
+            name = f"Place {gbpn_id}"
+
+            alternatives = []
+            if generator.random() < alternative_names:
+                alternatives = [
+                    f"{name} {suffix}"
+                    for suffix in ("Green", "End")[: generator.randint(1, 2)]
+                ]
+
+            row = {
+                "GBPNID": str(gbpn_id),
+                "PlaceName": name,
+                "GBPN_URL": f"https://gazetteer.org.uk/place/{gbpn_id}",
+                "HistCounty": f"Historic {county_name}",
+                "AdCounty": county_name,
+                "District": district_name,
+                "UniAuth": f"Authority {region}-{county}",
+                "Region": f"Region {region}",
+                "CivilParish": f"Parish {region}-{county}-{district}-{parish} CP",
+                "Alternative_Name": ",".join(alternatives),
+                "Type": generator.choice(PLACE_TYPES),
+                "NameType": "P",
+                "Lat": f"{generator.uniform(50.0, 58.5):.5f}",
+                "Lng": f"{generator.uniform(-6.0, 1.7):.5f}",
+            }
+            writer.writerow([row[column] for column in HEADER])
+            for alternative in alternatives:
+                alternative_row = dict(row, PlaceName=alternative, NameType="A")
+                writer.writerow([alternative_row[column] for column in HEADER])
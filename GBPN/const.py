@@ -4,6 +4,7 @@ from gramps.gen.config import INIFILE
 
 # General
 DOMAIN: Final = "gbpn"
+GBPN_URL_TYPE: Final = "GBPN URL"
 
 # INI keys
 INI_HIERARCHY_ADMIN: Final = "hierarchy.admin"
@@ -17,3 +18,5 @@ INI_PREFERENCES_HIERARCHY_ENABLED: Final = "preferences.hierarchy.enabled"
 INI_PREFERENCES_STRIP_CIVIL_PARISH_SUFFIX: Final = (
     "preferences.strip_civil_parish_suffix"
 )
+INI_PREFERENCES_TRANSACTION_SIZE: Final = "preferences.transaction_size"
+INI_PREFERENCES_PROFILE: Final = "preferences.profile"
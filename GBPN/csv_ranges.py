@@ -0,0 +1,142 @@
+"""
+Parsing of ``GBPN.csv`` in record-aligned byte ranges, so the store is built
+without holding the whole file in memory.
+"""
+
+import csv
+import io
+import os
+from operator import itemgetter
+from pathlib import Path
+from typing import Optional
+
+from spatial import get_cell, parse_coordinates
+
+# Parsed rows of a range: the values of each row, in the order of the requested
+# columns; a (search key, name, row) triple for each distinct place and
+# alternative name; and a (grid cell, latitude, longitude, row) tuple for each
+# preferred name with coordinates. Rows count from 1 within the range.
+ParsedRange = tuple[
+    list[tuple[str, ...]],
+    list[tuple[str, str, int]],
+    list[tuple[int, float, float, int]],
+]
+
+
+def normalize_name(name: str) -> str:
+    """
+    Return the search key for a place name: case-folded, with whitespace collapsed.
+    """
+    return " ".join(name.split()).casefold()
+
+
+def read_header(path: Path) -> tuple[list[str], int]:
+    """
+    Return the header fields of a CSV file and the byte offset of its first row.
+    """
+    with open(path, "rb") as handle:
+        line = handle.readline()
+    return next(csv.reader([line.decode("utf-8-sig")]), []), len(line)
+
+
+def split_ranges(path: Path, start: int, size: int) -> list[tuple[int, int]]:
+    """
+    Split a file from ``start`` into (start, end) byte ranges of about ``size``.
+
+    Each range ends just after a line break outside any quoted field, so it holds
+    whole records even where a quoted field spans several lines. Quotes are
+    counted as the file is read: a line break ends a record when an even number
+    of them has been read so far (an escaped ``""`` counts twice).
+    """
+    end_of_file = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        position = start
+        quoted = False
+        while position < end_of_file:
+            data = handle.read(size)
+            quoted ^= data.count(b'"') % 2 == 1
+            end = position + len(data)
+            # Read on to the end of the record in progress
+            while end < end_of_file:
+                line = handle.readline()
+                quoted ^= line.count(b'"') % 2 == 1
+                end += len(line)
+                if not quoted:
+                    break
+            ranges.append((position, end))
+            position = end
+    return ranges
+
+
+def parse_range(
+    path: Path,
+    start: int,
+    end: int,
+    columns: tuple[str, ...],
+    indices: list[Optional[int]],
+) -> ParsedRange:
+    """
+    Parse the rows between two byte offsets of a CSV file.
+
+    :param columns: The names of the columns to keep. They must include
+        ``PlaceName``, ``Alternative_Name``, ``NameType``, ``Lat`` and ``Lng``.
+    :param indices: The field index of each column to keep, or None for a column
+        missing from the file, which is read as an empty string.
+    """
+    name_position = columns.index("PlaceName")
+    alternative_position = columns.index("Alternative_Name")
+    name_type_position = columns.index("NameType")
+    lat_position = columns.index("Lat")
+    lng_position = columns.index("Lng")
+
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        data = handle.read(end - start)
+
+    if None in indices:
+
+        def get_values(fields: list[str]) -> tuple[str, ...]:
+            return tuple(
+                fields[i] if i is not None and i < count else "" for i in indices
+            )
+
+        width = 0
+    else:
+        get_values = itemgetter(*indices)
+        # Short rows are padded with empty strings
+        width = max(indices) + 1
+    padding = [""] * width
+
+    rows = []
+    names = []
+    points = []
+    for row, fields in enumerate(
+        csv.reader(io.StringIO(data.decode("utf-8"), newline="")), 1
+    ):
+        count = len(fields)
+        if count < width:
+            fields += padding[count:]
+        values = get_values(fields)
+        rows.append(values)
+
+        name = values[name_position]
+        alternatives = values[alternative_position]
+        key = normalize_name(name)
+        if key:
+            names.append((key, name.strip(), row))
+        if alternatives:
+            keys = {key}
+            for name in alternatives.split(","):
+                key = normalize_name(name)
+                if key and key not in keys:
+                    keys.add(key)
+                    names.append((key, name.strip(), row))
+
+        # Only preferred names are placed on the grid, so each place is found once
+        if values[name_type_position].strip().casefold() == "p":
+            coordinates = parse_coordinates(values[lat_position], values[lng_position])
+            if coordinates is not None:
+                points.append((get_cell(*coordinates), *coordinates, row))
+    return rows, names, points
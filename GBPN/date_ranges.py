@@ -0,0 +1,25 @@
+"""
+Date ranges for time-scoped place references, parsed once per locale.
+"""
+
+from gramps.gen.const import GRAMPS_LOCALE as glocale
+from gramps.gen.lib import Date
+
+_parsed: dict[tuple[str, str], Date] = {}
+
+
+def get_date_range(text: str) -> Date:
+    """
+    Return a new Date for a date range such as ``"before 1889-01-01"``.
+
+    Each text is parsed once for the current locale; callers get their own copy,
+    as the Date is stored on (and may be edited through) a PlaceRef.
+    """
+    key = (glocale.lang, text)
+    date = _parsed.get(key)
+    if date is None:
+        # The date handlers are only loaded once a hierarchy is imported
+        from gramps.gen.datehandler import parser
+
+        date = _parsed[key] = parser.parse(text)
+    return Date(date)
@@ -0,0 +1,760 @@
+"""
+Access to the Gazetteer of British Place Names data.
+"""
+
+import csv
+import functools
+import logging
+import math
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+
+from const import DOMAIN
+from csv_ranges import (
+    ParsedRange,
+    normalize_name,
+    parse_range,
+    read_header,
+    split_ranges,
+)
+from spatial import GRID_CELL_SIZE, KM_PER_DEGREE, get_cell_ranges, get_distance
+
+LOG = logging.getLogger(DOMAIN)
+
+# The gazetteer is stored next to the addon
+DEFAULT_CSV_PATH = Path(__file__).parent / "GBPN.csv"
+
+# Separators accepted between GBPN IDs in a pasted list
+_ID_SEPARATORS = re.compile(r"[\s,;]+")
+
+# Columns that whole-gazetteer imports can be filtered by
+FILTER_COLUMNS = ("Region", "HistCounty", "UniAuth")
+
+
+class GazetteerRow(NamedTuple):
+    """
+    A row of ``GBPN.csv``, limited to the columns the addon reads.
+
+    Fields are named after the CSV columns.
+    """
+
+    GBPNID: str
+    PlaceName: str
+    GBPN_URL: str
+    Region: str
+    HistCounty: str
+    AdCounty: str
+    District: str
+    UniAuth: str
+    CivilParish: str
+    Alternative_Name: str
+    Type: str
+    NameType: str
+    Lat: str
+    Lng: str
+
+
+# Columns of GBPN.csv kept in the local store; everything the importer reads.
+COLUMNS = GazetteerRow._fields
+
+# Rows between progress reports while streaming the whole gazetteer
+PROGRESS_INTERVAL = 10000
+
+# Bytes of GBPN.csv parsed at a time while building the store
+PARSE_RANGE_SIZE = 4 * 1024 * 1024
+
+# Stay well below SQLite's limit on bound parameters per statement
+_SQL_VARIABLE_LIMIT = 900
+
+# Bump when the store layout changes so stale stores are rebuilt.
+STORE_VERSION = 3
+
+# Default number of results returned by a name search
+SEARCH_LIMIT = 20
+
+# GBPNIDs whose rows are kept in memory, see Gazetteer.get_rows_for_ids
+ROW_CACHE_SIZE = 10000
+
+# Sorts after any character, bounding a prefix range scan over the name keys
+_MAX_CHARACTER = "\U0010ffff"
+
+# Columns with few distinct values, stored as references into a table of strings
+INTERNED_COLUMNS = frozenset(
+    (
+        "Region",
+        "HistCounty",
+        "AdCounty",
+        "District",
+        "UniAuth",
+        "CivilParish",
+        "Type",
+        "NameType",
+    )
+)
+
+_SELECT_COLUMNS = ", ".join(f'"{column}"' for column in COLUMNS)
+_COLUMN_DEFINITIONS = ", ".join(
+    f'"{column}" {"INTEGER" if column in INTERNED_COLUMNS else "TEXT"}'
+    for column in COLUMNS
+)
+_INTERNED_POSITIONS = tuple(
+    position for position, column in enumerate(COLUMNS) if column in INTERNED_COLUMNS
+)
+
+
+class Gazetteer:
+    """
+    Read rows from ``GBPN.csv`` through a compact SQLite copy of it.
+
+    On first use the CSV is converted once into ``GBPN.sqlite`` next to it, keeping
+    only the columns in :data:`COLUMNS`, indexed by GBPNID, plus a sorted index of
+    normalised place and alternative names for prefix searches and a grid of the
+    places' coordinates (see :mod:`spatial`) for nearest-place and box searches.
+    Repetitive columns (regions, counties, types...) are interned into a string
+    table. The store is rebuilt whenever the size or modification time of the CSV
+    no longer matches. If the plugin directory is not writable, the store is kept
+    in the temporary directory.
+
+    The CSV is parsed in record-aligned ranges of :data:`PARSE_RANGE_SIZE` bytes,
+    each into compact row tuples that are written to the store before the next
+    range is read, so a rebuild holds one range in memory rather than the file.
+
+    The rows of the last ``cache_size`` GBPNIDs looked up are kept in memory until
+    the store is rebuilt, so importing the same or recently seen IDs again does
+    not read the store.
+    """
+
+    def __init__(self, csv_path: Path, cache_size: int = ROW_CACHE_SIZE):
+        self.csv_path = csv_path
+        self.cache_size = cache_size
+        self.store_path = csv_path.with_suffix(".sqlite")
+        self._active_path: Optional[Path] = None
+        self._signature: Optional[tuple[int, int]] = None
+        self._strings: list[str] = []
+        # Stores may be built from a worker thread
+        self._lock = threading.Lock()
+        # Idle connections to the store they were opened for, see __connect
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_store: Optional[tuple[Path, tuple[int, int]]] = None
+        self._connections_lock = threading.Lock()
+        # (rowid, row) pairs by GBPNID, least recently used first, for the store
+        # they were read from
+        self._row_cache: OrderedDict[str, tuple[tuple[int, GazetteerRow], ...]] = (
+            OrderedDict()
+        )
+        self._row_cache_store: Optional[tuple[Path, tuple[int, int]]] = None
+        self._row_cache_lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return self.csv_path.exists()
+
+    def get_rows_for_ids(
+        self, gbpn_ids: Iterable[str], name_type: Optional[str] = None
+    ) -> list[GazetteerRow]:
+        """
+        Return every row for any of the given GBPNIDs, in file order.
+
+        IDs in the row cache are not read from the store again; the others are read
+        together and added to it.
+
+        :param name_type: Only return rows with this ``NameType`` (e.g. ``"P"``).
+        """
+        path, strings, signature = self.__ensure_store()
+        store = (path, signature)
+        gbpn_ids = set(gbpn_ids)
+        records = []
+        with self._row_cache_lock:
+            if self._row_cache_store != store:
+                self._row_cache.clear()
+                self._row_cache_store = store
+            for gbpn_id in list(gbpn_ids):
+                cached = self._row_cache.get(gbpn_id)
+                if cached is not None:
+                    self._row_cache.move_to_end(gbpn_id)
+                    records.extend(cached)
+                    gbpn_ids.discard(gbpn_id)
+
+        if gbpn_ids:
+            # IDs that are not in the gazetteer are cached too
+            found: dict[str, list[tuple[int, GazetteerRow]]] = {
+                gbpn_id: [] for gbpn_id in gbpn_ids
+            }
+            with self.__connect(path, signature) as connection:
+                for record in self.__get_rows_by_gbpn_id(connection, strings, gbpn_ids):
+                    found[record[1].GBPNID].append(record)
+                    records.append(record)
+            with self._row_cache_lock:
+                # The store may have been rebuilt meanwhile
+                if self._row_cache_store == store:
+                    for gbpn_id, rows in found.items():
+                        self._row_cache[gbpn_id] = tuple(rows)
+                    while len(self._row_cache) > self.cache_size:
+                        self._row_cache.popitem(last=False)
+
+        records.sort(key=lambda record: record[0])
+        # Filtered here rather than in the query, as the cache holds every row
+        if name_type:
+            name_type = name_type.casefold()
+            return [row for _, row in records if row.NameType.casefold() == name_type]
+        return [row for _, row in records]
+
+    def iter_rows(
+        self,
+        progress: Optional[Callable[[float], None]] = None,
+        filters: Optional[dict[str, str]] = None,
+        name_type: Optional[str] = None,
+        gbpn_ids: Optional[set[str]] = None,
+    ) -> Iterator[GazetteerRow]:
+        """
+        Yield rows in file order, holding only one row in memory at a time.
+
+        :param progress: Called periodically with the fraction of rows read.
+        :param filters: Column filters, as accepted by :func:`matches_filters`.
+            Only columns in :data:`INTERNED_COLUMNS` can be filtered.
+        :param name_type: Only yield rows with this ``NameType`` (e.g. ``"P"``).
+        :param gbpn_ids: Only yield rows for these GBPNIDs. They are matched while
+            streaming, which suits more IDs than :meth:`get_rows_for_ids` handles well.
+        """
+        path, strings, signature = self.__ensure_store()
+        # Filters are resolved against the (small) string table, so the row
+        # scan only compares integers.
+        clauses = []
+        for column, value in (filters or {}).items():
+            if value.strip():
+                clauses.append(
+                    self.__in_clause(
+                        column,
+                        strings,
+                        lambda string: matches_filters(
+                            {column: string}, {column: value}
+                        ),
+                    )
+                )
+        if name_type:
+            clauses.append(self.__name_type_clause(strings, name_type))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self.__connect(path, signature) as connection:
+            last_rowid = connection.execute("SELECT max(rowid) FROM rows").fetchone()[0]
+            cursor = connection.execute(
+                f"SELECT rowid, {_SELECT_COLUMNS} FROM rows {where} ORDER BY rowid"
+            )
+            for position, record in enumerate(cursor):
+                if progress is not None and position % PROGRESS_INTERVAL == 0:
+                    progress(record[0] / (last_rowid or 1))
+                # GBPNID is the first column, and is not interned
+                if gbpn_ids is not None and record[1] not in gbpn_ids:
+                    continue
+                yield self.__decode(record[1:], strings)
+
+    def search_names(
+        self, prefix: str, limit: int = SEARCH_LIMIT
+    ) -> list[tuple[str, GazetteerRow]]:
+        """
+        Return places with a name or alternative name starting with ``prefix``.
+
+        Matching ignores case and repeated whitespace. Each GBPNID is returned once,
+        as the matching name and the first row carrying it, ordered by name.
+        """
+        key = normalize_name(prefix)
+        if not key:
+            return []
+
+        results = []
+        seen = set()
+        path, strings, signature = self.__ensure_store()
+        with self.__connect(path, signature) as connection:
+            # A range scan over the sorted name keys, so the cost depends on the
+            # number of results rather than the size of the gazetteer.
+            cursor = connection.execute(
+                f"SELECT names.name, {_SELECT_COLUMNS} FROM names "
+                "JOIN rows ON rows.rowid = names.row "
+                "WHERE names.key >= ? AND names.key < ? "
+                "ORDER BY names.key, names.row",
+                (key, key + _MAX_CHARACTER),
+            )
+            for record in cursor:
+                row = self.__decode(record[1:], strings)
+                if row.GBPNID in seen:
+                    continue
+                seen.add(row.GBPNID)
+                results.append((record[0], row))
+                if len(results) >= limit:
+                    break
+            return results
+
+    def find_names(self, names: Iterable[str]) -> dict[str, list[GazetteerRow]]:
+        """
+        Return the places with any of the given names, keyed by normalised name.
+
+        Names match whole, ignoring case and repeated whitespace, against place
+        and alternative names. Each place is returned once per name, as its
+        preferred (``P``) row, in file order.
+        """
+        keys = list({key for key in map(normalize_name, names) if key})
+        found: dict[str, set[str]] = {}
+        path, _, signature = self.__ensure_store()
+        with self.__connect(path, signature) as connection:
+            for start in range(0, len(keys), _SQL_VARIABLE_LIMIT):
+                chunk = keys[start : start + _SQL_VARIABLE_LIMIT]
+                placeholders = ", ".join("?" * len(chunk))
+                for key, gbpn_id in connection.execute(
+                    'SELECT DISTINCT names.key, rows."GBPNID" FROM names '
+                    "JOIN rows ON rows.rowid = names.row "
+                    f"WHERE names.key IN ({placeholders})",
+                    chunk,
+                ):
+                    found.setdefault(key, set()).add(gbpn_id)
+        rows = self.get_rows_for_ids(set().union(*found.values()), "P")
+
+        rows_by_id: dict[str, list[GazetteerRow]] = {}
+        for row in rows:
+            rows_by_id.setdefault(row.GBPNID, []).append(row)
+        # In file order, as the IDs were first seen
+        order = {gbpn_id: position for position, gbpn_id in enumerate(rows_by_id)}
+        return {
+            key: [
+                row
+                for gbpn_id in sorted(gbpn_ids & rows_by_id.keys(), key=order.get)
+                for row in rows_by_id[gbpn_id]
+            ]
+            for key, gbpn_ids in found.items()
+        }
+
+    def find_nearest(
+        self,
+        lat: float,
+        lng: float,
+        limit: int = SEARCH_LIMIT,
+        max_distance: Optional[float] = None,
+    ) -> list[tuple[float, GazetteerRow]]:
+        """
+        Return the places nearest to a position, as (distance in km, row) pairs.
+
+        Only preferred names (``NameType`` ``P``) with coordinates are found, each
+        place once, nearest first. The grid is searched in ever larger boxes around
+        the position until one holds ``limit`` places closer than its edges.
+
+        :param max_distance: Ignore places further away, in kilometres.
+        """
+        if limit <= 0 or not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+            return []
+
+        path, strings, signature = self.__ensure_store()
+        with self.__connect(path, signature) as connection:
+            half_height = GRID_CELL_SIZE
+            while True:
+                # Keep the box about square on the ground
+                half_width = half_height / max(math.cos(math.radians(lat)), 1e-6)
+                candidates = sorted(
+                    (get_distance(lat, lng, point_lat, point_lng), row)
+                    for point_lat, point_lng, row in self.__query_box(
+                        connection,
+                        lat - half_height,
+                        lng - half_width,
+                        lat + half_height,
+                        lng + half_width,
+                    )
+                )
+                if max_distance is not None:
+                    candidates = [
+                        candidate
+                        for candidate in candidates
+                        if candidate[0] <= max_distance
+                    ]
+
+                # Any place outside the box is further away than its nearest edge
+                edge_lat = min(abs(lat) + half_height, 90.0)
+                reach = KM_PER_DEGREE * min(
+                    half_height, half_width * math.cos(math.radians(edge_lat))
+                )
+                if half_height >= 180.0 or (
+                    max_distance is not None and reach >= max_distance
+                ):
+                    break
+                if len(candidates) >= limit and candidates[limit - 1][0] <= reach:
+                    break
+                half_height *= 2
+
+            candidates = candidates[:limit]
+            rows = self.__get_rows_by_rowid(
+                connection, strings, [row for _, row in candidates]
+            )
+            return [(distance, rows[row]) for distance, row in candidates]
+
+    def find_in_box(
+        self,
+        south: float,
+        west: float,
+        north: float,
+        east: float,
+        limit: Optional[int] = None,
+    ) -> list[GazetteerRow]:
+        """
+        Return the places within a box of latitudes and longitudes, in file order.
+
+        Only preferred names (``NameType`` ``P``) with coordinates are found, each
+        place once. Boxes crossing the 180th meridian are not supported.
+
+        :param limit: Return at most this many places, the first in file order.
+        """
+        path, strings, signature = self.__ensure_store()
+        with self.__connect(path, signature) as connection:
+            rowids = sorted(
+                row
+                for _, _, row in self.__query_box(connection, south, west, north, east)
+            )
+            if limit is not None:
+                rowids = rowids[:limit]
+            rows = self.__get_rows_by_rowid(connection, strings, rowids)
+            return [rows[rowid] for rowid in rowids]
+
+    @staticmethod
+    def __query_box(
+        connection: sqlite3.Connection,
+        south: float,
+        west: float,
+        north: float,
+        east: float,
+    ) -> list[tuple[float, float, int]]:
+        """
+        Return the (latitude, longitude, rowid) of the places within a box.
+        """
+        south = max(south, -90.0)
+        north = min(north, 90.0)
+        west = max(west, -180.0)
+        east = min(east, 180.0)
+        if south > north or west > east:
+            return []
+
+        points = []
+        # One range scan over the grid index per band of latitude
+        for first, last in get_cell_ranges(south, west, north, east):
+            points.extend(
+                connection.execute(
+                    "SELECT lat, lng, row FROM points "
+                    "WHERE cell BETWEEN ? AND ? "
+                    "AND lat BETWEEN ? AND ? AND lng BETWEEN ? AND ?",
+                    (first, last, south, north, west, east),
+                )
+            )
+        return points
+
+    @classmethod
+    def __get_rows_by_gbpn_id(
+        cls,
+        connection: sqlite3.Connection,
+        strings: list[str],
+        gbpn_ids: Iterable[str],
+    ) -> list[tuple[int, GazetteerRow]]:
+        """
+        Return (rowid, row) pairs for the GBPNIDs, in file order.
+        """
+        gbpn_ids = list(set(gbpn_ids))
+        records = []
+        for start in range(0, len(gbpn_ids), _SQL_VARIABLE_LIMIT):
+            chunk = gbpn_ids[start : start + _SQL_VARIABLE_LIMIT]
+            placeholders = ", ".join("?" * len(chunk))
+            records.extend(
+                connection.execute(
+                    f"SELECT rowid, {_SELECT_COLUMNS} FROM rows "
+                    f'WHERE "GBPNID" IN ({placeholders})',
+                    chunk,
+                )
+            )
+        records.sort()
+        return [(record[0], cls.__decode(record[1:], strings)) for record in records]
+
+    @classmethod
+    def __get_rows_by_rowid(
+        cls, connection: sqlite3.Connection, strings: list[str], rowids: list[int]
+    ) -> dict[int, GazetteerRow]:
+        rows = {}
+        for start in range(0, len(rowids), _SQL_VARIABLE_LIMIT):
+            chunk = rowids[start : start + _SQL_VARIABLE_LIMIT]
+            placeholders = ", ".join("?" * len(chunk))
+            for record in connection.execute(
+                f"SELECT rowid, {_SELECT_COLUMNS} FROM rows "
+                f"WHERE rowid IN ({placeholders})",
+                chunk,
+            ):
+                rows[record[0]] = cls.__decode(record[1:], strings)
+        return rows
+
+    @staticmethod
+    def __in_clause(
+        column: str, strings: list[str], predicate: Callable[[str], bool]
+    ) -> str:
+        if column not in INTERNED_COLUMNS:
+            raise ValueError(f"Cannot filter on column {column}")
+        ids = ", ".join(
+            str(string_id)
+            for string_id, string in enumerate(strings)
+            if predicate(string)
+        )
+        return f'"{column}" IN ({ids})'
+
+    @classmethod
+    def __name_type_clause(cls, strings: list[str], name_type: str) -> str:
+        name_type = name_type.casefold()
+        return cls.__in_clause(
+            "NameType", strings, lambda string: string.casefold() == name_type
+        )
+
+    @staticmethod
+    def __decode(record: tuple, strings: list[str]) -> GazetteerRow:
+        values = list(record)
+        for position in _INTERNED_POSITIONS:
+            values[position] = strings[values[position]]
+        return GazetteerRow._make(values)
+
+    # -------------------
+    # Store
+    # -------------------
+
+    @contextmanager
+    def __connect(
+        self, path: Path, signature: tuple[int, int]
+    ) -> Iterator[sqlite3.Connection]:
+        """
+        Lend a connection to the store at ``path`` for the length of a read.
+
+        Connections are kept for the session, until the store is rebuilt, and lent
+        to one reader at a time on any thread: the gramplet reads on a new thread
+        for each import and search, which then neither open the store again nor
+        lose its page cache.
+        """
+        store = (path, signature)
+        connection = None
+        with self._connections_lock:
+            if self._connections_store != store:
+                for idle in self._connections:
+                    idle.close()
+                self._connections = []
+                self._connections_store = store
+            if self._connections:
+                connection = self._connections.pop()
+        if connection is None:
+            connection = _connect_read_only(path, check_same_thread=False)
+        try:
+            yield connection
+        finally:
+            with self._connections_lock:
+                if self._connections_store == store:
+                    self._connections.append(connection)
+                    connection = None
+            if connection is not None:
+                connection.close()
+
+    def __ensure_store(self) -> tuple[Path, list[str], tuple[int, int]]:
+        signature = self.__get_signature()
+        with self._lock:
+            if self._active_path is not None and self._signature == signature:
+                return self._active_path, self._strings, signature
+
+            fallback_path = Path(tempfile.gettempdir()) / (
+                f"GBPN-{signature[0]}-{signature[1]}.sqlite"
+            )
+            for path in (self.store_path, fallback_path):
+                if self.__is_current(path, signature):
+                    break
+            else:
+                try:
+                    path = self.store_path
+                    self.__build_store(path, signature)
+                except (OSError, sqlite3.Error) as err:
+                    LOG.warning("Unable to write %s: %s", self.store_path, err)
+                    path = fallback_path
+                    self.__build_store(path, signature)
+
+            with closing(_connect_read_only(path)) as connection:
+                self._strings = [
+                    value
+                    for (value,) in connection.execute(
+                        "SELECT value FROM strings ORDER BY id"
+                    )
+                ]
+            self._active_path = path
+            self._signature = signature
+            return path, self._strings, signature
+
+    def __get_signature(self) -> tuple[int, int]:
+        stat = self.csv_path.stat()
+        return stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def __is_current(path: Path, signature: tuple[int, int]) -> bool:
+        if not path.exists():
+            return False
+        try:
+            with closing(_connect_read_only(path)) as connection:
+                meta = dict(connection.execute("SELECT key, value FROM meta"))
+        except sqlite3.Error as err:
+            LOG.warning("Unable to read %s: %s", path, err)
+            return False
+
+        current = meta == {
+            "version": str(STORE_VERSION),
+            "size": str(signature[0]),
+            "mtime_ns": str(signature[1]),
+        }
+        if not current:
+            LOG.debug("Store %s is stale, rebuilding", path)
+        return current
+
+    def __build_store(self, path: Path, signature: tuple[int, int]) -> None:
+        """
+        Convert the CSV into a new store at ``path``, replacing any existing one.
+        """
+        LOG.debug("Building %s from %s", path, self.csv_path)
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.unlink(missing_ok=True)
+
+        with closing(sqlite3.connect(tmp_path)) as connection:
+            connection.execute("PRAGMA journal_mode = OFF")
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.execute(f"CREATE TABLE rows ({_COLUMN_DEFINITIONS})")
+            connection.execute(
+                "CREATE TABLE strings (id INTEGER PRIMARY KEY, value TEXT)"
+            )
+            connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            connection.execute("CREATE TABLE names (key TEXT, name TEXT, row INTEGER)")
+            connection.execute(
+                "CREATE TABLE points (cell INTEGER, lat REAL, lng REAL, row INTEGER)"
+            )
+
+            count = 0
+            insert = f"INSERT INTO rows VALUES ({', '.join('?' * len(COLUMNS))})"
+            strings: dict[str, int] = {}
+            for rows, names, points in self.__parse_csv():
+                batch = []
+                for values in rows:
+                    values = list(values)
+                    for position in _INTERNED_POSITIONS:
+                        values[position] = strings.setdefault(
+                            values[position], len(strings)
+                        )
+                    batch.append(values)
+                connection.executemany(insert, batch)
+                # Rows are inserted in order, so their rowids are known here
+                connection.executemany(
+                    "INSERT INTO names VALUES (?, ?, ?)",
+                    [(key, name, count + row) for key, name, row in names],
+                )
+                connection.executemany(
+                    "INSERT INTO points VALUES (?, ?, ?, ?)",
+                    [(cell, lat, lng, count + row) for cell, lat, lng, row in points],
+                )
+                count += len(batch)
+
+            connection.executemany(
+                "INSERT INTO strings VALUES (?, ?)",
+                ((string_id, value) for value, string_id in strings.items()),
+            )
+            connection.execute('CREATE INDEX rows_gbpnid ON rows ("GBPNID")')
+            connection.execute("CREATE INDEX names_key ON names (key, row)")
+            # Covers box searches, which then never read the points table itself
+            connection.execute(
+                "CREATE INDEX points_cell ON points (cell, lat, lng, row)"
+            )
+            connection.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [
+                    ("version", str(STORE_VERSION)),
+                    ("size", str(signature[0])),
+                    ("mtime_ns", str(signature[1])),
+                ],
+            )
+            connection.commit()
+
+        os.replace(tmp_path, path)
+        LOG.debug("Stored %d rows in %s", count, path)
+
+    def __parse_csv(self) -> Iterator[ParsedRange]:
+        """
+        Parse the CSV in record-aligned byte ranges, yielding their rows in order.
+        """
+        header, start = read_header(self.csv_path)
+        indices = [
+            header.index(column) if column in header else None for column in COLUMNS
+        ]
+        for byte_range in split_ranges(self.csv_path, start, PARSE_RANGE_SIZE):
+            yield parse_range(self.csv_path, *byte_range, COLUMNS, indices)
+
+
+@functools.cache
+def get_gazetteer(csv_path: Path) -> Gazetteer:
+    """
+    Return the gazetteer for a CSV, shared for the session.
+
+    Its store, string table and connections stay open between imports, so only
+    the first one reads them.
+    """
+    return Gazetteer(csv_path)
+
+
+def _connect_read_only(path: Path, **kwargs) -> sqlite3.Connection:
+    return sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True, **kwargs)
+
+
+def matches_filters(row: dict[str, str], filters: dict[str, str]) -> bool:
+    """
+    Check a row against column filters, ignoring case and empty filter values.
+
+    Slash-separated fields (e.g. several historic counties) match on any part.
+    """
+    for column, value in filters.items():
+        value = value.strip().casefold()
+        if not value:
+            continue
+        parts = {part.strip().casefold() for part in (row.get(column) or "").split("/")}
+        if value not in parts:
+            return False
+    return True
+
+
+def parse_gbpn_ids(text: str) -> Optional[list[str]]:
+    """
+    Parse a list of GBPN IDs separated by commas, semicolons or whitespace.
+
+    Returns the unique IDs in their original order, or None if any entry is not
+    a number.
+    """
+    ids = [part for part in _ID_SEPARATORS.split(text) if part]
+    if not all(part.isdigit() for part in ids):
+        return None
+    return list(dict.fromkeys(ids))
+
+
+def read_gbpn_ids(path: Path) -> list[str]:
+    """
+    Read GBPN IDs from a text or CSV file.
+
+    A CSV file with a ``GBPNID`` header column is read by that column; otherwise
+    the first field of each line is used when it is a number.
+    """
+    with open(path, encoding="utf-8-sig", newline="") as handle:
+        lines = handle.read().splitlines()
+
+    rows = list(csv.reader(lines))
+    column = 0
+    if rows and "GBPNID" in rows[0]:
+        column = rows[0].index("GBPNID")
+        rows = rows[1:]
+
+    ids = []
+    for row in rows:
+        if len(row) <= column:
+            continue
+        value = _ID_SEPARATORS.split(row[column].strip())[0]
+        if value.isdigit():
+            ids.append(value)
+    return list(dict.fromkeys(ids))
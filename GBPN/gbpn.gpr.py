@@ -17,3 +17,23 @@ register(
     gramplet_title=_("GBPN"),
     include_in_listing=True,
 )
+
+register(
+    TOOL,
+    id="gbpn",
+    name=_("GBPN Import"),
+    description=_(
+        "Import places from the Gazetteer of British Placenames (GBPN) "
+        "from the command line."
+    ),
+    authors=["Owen Voke"],
+    authors_email=["development@voke.dev"],
+    status=EXPERIMENTAL,
+    version="1.0.0",
+    gramps_target_version="6.0",
+    fname="gbpn_tool.py",
+    category=TOOL_DBPROC,
+    toolclass="GBPNTool",
+    optionclass="GBPNToolOptions",
+    tool_modes=[TOOL_MODE_CLI],
+)
@@ -2,26 +2,17 @@
 GBPN Gramplet.
 """
 
-import csv
 import logging
+import threading
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterator, Optional
 
-from gi.repository import Gtk
-from gramps.gen.datehandler import parser
-from gramps.gen.db import DbReadBase, DbTxn, DbWriteBase
+from gi.repository import GLib, Gtk
 
 from gramps.gen.plug import Gramplet
-from gramps.gen.lib import (
-    Place,
-    PlaceName,
-    PlaceType,
-    Url,
-    PlaceRef,
-    Date,
-)
+from gramps.gui.dialog import QuestionDialog2
 
-from gramps.gen.config import config
 from gramps.gen.const import GRAMPS_LOCALE as glocale
 
 from const import (
@@ -32,8 +23,36 @@ from const import (
     INI_HIERARCHY_MODERN,
     INI_HIERARCHY_CIVIL_PARISH,
     INI_PREFERENCES_STRIP_CIVIL_PARISH_SUFFIX,
+    INI_PREFERENCES_TRANSACTION_SIZE,
+    INI_PREFERENCES_PROFILE,
     DOMAIN,
 )
+from gazetteer import (
+    DEFAULT_CSV_PATH,
+    FILTER_COLUMNS,
+    Gazetteer,
+    GazetteerRow,
+    get_gazetteer,
+    parse_gbpn_ids,
+    read_gbpn_ids,
+)
+from import_job import ImportJob
+from importer import (
+    BULK_TRANSACTION_SIZE,
+    PlaceImporter,
+    format_stats,
+    get_place_rows,
+    iter_sync_rows,
+)
+from place_export import (
+    EXPORT_SUFFIXES,
+    ExportJob,
+    PlaceExporter,
+    get_export_format,
+)
+from place_index import PlaceIndex
+from place_matcher import PlaceMatcher, collect_untagged_places
+from settings import get_config, get_profile_path
 
 try:
     _trans = glocale.get_addon_translator(__file__)
@@ -43,16 +62,11 @@ _ = _trans.gettext
 
 LOG = logging.getLogger(DOMAIN)
 
-# Configuration
-CONFIG = config.register_manager(DOMAIN)
-CONFIG.register(INI_PREFERENCES_ALTERNATIVE_NAMES_ENABLED, True)
-CONFIG.register(INI_PREFERENCES_HIERARCHY_ENABLED, True)
-CONFIG.register(INI_PREFERENCES_STRIP_CIVIL_PARISH_SUFFIX, False)
-CONFIG.register(INI_HIERARCHY_ADMIN, True)
-CONFIG.register(INI_HIERARCHY_CIVIL_PARISH, True)
-CONFIG.register(INI_HIERARCHY_HISTORIC, True)
-CONFIG.register(INI_HIERARCHY_MODERN, True)
-CONFIG.load()
+# Milliseconds between checks for rows read by a background import job
+POLL_INTERVAL = 50
+
+# Characters typed before the name search starts suggesting places
+SEARCH_MIN_LENGTH = 2
 
 
 class GBPN(Gramplet):
@@ -60,10 +74,6 @@ class GBPN(Gramplet):
     Import places from the Gazetteer of British Place Names into Gramps by GBPNID.
     """
 
-    HISTORIC_COUNTIES_DATE_PERIOD = "before 1889-01-01"
-    ADMINISTRATIVE_COUNTIES_DATE_PERIOD = "from 1889-01-01 to 1974-01-01"
-    MODERN_REGIONS_DATE_PERIOD = "after 1974-01-01"
-
     # Config booleans
     _alternative_names_enabled: bool = None
     _hierarchy_enabled: bool = None
@@ -72,22 +82,23 @@ class GBPN(Gramplet):
     _hierarchy_historic: bool = None
     _hierarchy_modern: bool = None
     _strip_civil_parish_suffix: bool = None
-
-    _gbpn_id: str = None
+    _transaction_size: int = None
+    _profile: bool = None
+    _preferences_loaded: bool = False
+
+    _gazetteer: Gazetteer = None
+    _place_index: PlaceIndex = None
+    # An import, match or export; one runs at a time
+    _job: ImportJob | ExportJob = None
+    _job_started: float = None
+    _importer: PlaceImporter = None
+    # The importer of the running job: _importer, or a dry run one
+    _job_importer: PlaceImporter = None
+    _search_generation: int = 0
 
     def init(self):
-        self._alternative_names_enabled = CONFIG.get(
-            INI_PREFERENCES_ALTERNATIVE_NAMES_ENABLED
-        )
-        self._hierarchy_enabled = CONFIG.get(INI_PREFERENCES_HIERARCHY_ENABLED)
-        self._hierarchy_historic = CONFIG.get(INI_HIERARCHY_HISTORIC)
-        self._hierarchy_admin = CONFIG.get(INI_HIERARCHY_ADMIN)
-        self._hierarchy_modern = CONFIG.get(INI_HIERARCHY_MODERN)
-        self._hierarchy_civil_parish = CONFIG.get(INI_HIERARCHY_CIVIL_PARISH)
-        self._strip_civil_parish_suffix = CONFIG.get(
-            INI_PREFERENCES_STRIP_CIVIL_PARISH_SUFFIX
-        )
-
+        # Preferences, the gazetteer and the place index are loaded on first use,
+        # so the gramplet adds little to Gramps' startup
         root = self.__create_gui()
         self.gui.get_container_widget().remove(self.gui.textview)
         self.gui.get_container_widget().add_with_viewport(root)
@@ -104,11 +115,28 @@ class GBPN(Gramplet):
         vbox.set_margin_right(10)
 
         gbpn_id_label = Gtk.Label(
-            _("ID to import from Gazetteer of British Place Names")
+            _("ID(s) to import from Gazetteer of British Place Names")
         )
         gbpn_id_label.set_halign(Gtk.Align.START)
 
         self.gbpn_id_entry = Gtk.Entry()
+        self.gbpn_id_entry.set_placeholder_text(_("e.g. 1234 or 1234, 5678"))
+
+        search_label = Gtk.Label(_("Find IDs by place name"))
+        search_label.set_halign(Gtk.Align.START)
+
+        self.search_results = Gtk.ListStore(str, str)
+        completion = Gtk.EntryCompletion()
+        completion.set_model(self.search_results)
+        completion.set_text_column(0)
+        # Results are already filtered by the gazetteer search
+        completion.set_match_func(lambda *args: True)
+        completion.connect("match-selected", self.__select_search_result)
+
+        self.search_entry = Gtk.SearchEntry()
+        self.search_entry.set_placeholder_text(_("e.g. Little Snoring"))
+        self.search_entry.set_completion(completion)
+        self.search_entry.connect("search-changed", self.__search_names)
 
         self.errors_label = Gtk.Label()
         self.errors_label.set_halign(Gtk.Align.START)
@@ -120,442 +148,830 @@ class GBPN(Gramplet):
         get.connect("clicked", self.__get_places)
         button_box.add(get)
 
+        load = Gtk.Button(label=_("Load IDs from file..."))
+        load.connect("clicked", self.__load_ids)
+        button_box.add(load)
+
+        sync = Gtk.Button(label=_("Sync imported places"))
+        sync.set_tooltip_text(
+            _(
+                "Update the places already tagged with a GBPN ID from the "
+                "current gazetteer, writing only the places that changed"
+            )
+        )
+        sync.connect("clicked", self.__sync_places)
+        button_box.add(sync)
+
+        export = Gtk.Button(label=_("Export tagged places..."))
+        export.set_tooltip_text(
+            _(
+                "Write the places tagged with a GBPN ID and their enclosing places "
+                "by period to a CSV or GeoJSON file"
+            )
+        )
+        export.connect("clicked", self.__export_places)
+        button_box.add(export)
+
+        self.import_buttons = [get, load, sync, export]
+
+        self.dry_run_check = Gtk.CheckButton(
+            label=_("Dry run: preview the changes without writing them")
+        )
+
+        self.progress_bar = Gtk.ProgressBar()
+        self.progress_bar.set_show_text(True)
+        self.progress_bar.set_hexpand(True)
+
+        cancel = Gtk.Button(label=_("Cancel"))
+        cancel.connect("clicked", self.__cancel_import)
+
+        self.progress_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        self.progress_box.pack_start(self.progress_bar, True, True, 0)
+        self.progress_box.pack_start(cancel, False, False, 0)
+        # Shown while a job runs, see __set_running; show_all() skips the box
+        self.progress_box.set_no_show_all(True)
+        self.progress_bar.show()
+        cancel.show()
+
         vbox.pack_start(gbpn_id_label, False, True, 0)
         vbox.pack_start(self.gbpn_id_entry, False, True, 0)
+        vbox.pack_start(search_label, False, True, 0)
+        vbox.pack_start(self.search_entry, False, True, 0)
         vbox.pack_start(self.errors_label, False, True, 0)
         vbox.pack_start(button_box, False, True, 0)
+        vbox.pack_start(self.dry_run_check, False, True, 0)
+        vbox.pack_start(self.progress_box, False, True, 0)
+        vbox.pack_start(
+            self.__create_expander(
+                _("Import all places"), self.__create_import_all_gui
+            ),
+            False,
+            True,
+            0,
+        )
+        vbox.pack_start(
+            self.__create_expander(_("Match untagged places"), self.__create_match_gui),
+            False,
+            True,
+            0,
+        )
 
         return vbox
 
+    def __create_expander(
+        self, label: str, create_content: Callable[[], Gtk.Widget]
+    ) -> Gtk.Expander:
+        """
+        Create an expander whose content is only created when it is first opened.
+        """
+        expander = Gtk.Expander(label=label)
+
+        def on_expanded(expander, param):
+            if expander.get_expanded() and expander.get_child() is None:
+                content = create_content()
+                expander.add(content)
+                content.show_all()
+
+        expander.connect("notify::expanded", on_expanded)
+        return expander
+
+    def __create_import_all_gui(self):
+        """
+        Create the controls for importing the whole gazetteer, optionally filtered.
+        """
+        grid = Gtk.Grid(column_spacing=10, row_spacing=5)
+        grid.set_margin_top(5)
+
+        labels = {
+            "Region": _("Region"),
+            "HistCounty": _("Historic county"),
+            "UniAuth": _("Unitary authority"),
+        }
+        self.filter_entries = {}
+        for position, column in enumerate(FILTER_COLUMNS):
+            label = Gtk.Label(label=labels[column])
+            label.set_halign(Gtk.Align.START)
+            entry = Gtk.Entry()
+            entry.set_hexpand(True)
+            entry.set_placeholder_text(_("Any"))
+            grid.attach(label, 0, position, 1, 1)
+            grid.attach(entry, 1, position, 1, 1)
+            self.filter_entries[column] = entry
+
+        button_box = Gtk.ButtonBox()
+        button_box.set_layout(Gtk.ButtonBoxStyle.START)
+        import_all = Gtk.Button(label=_("Import all places"))
+        import_all.connect("clicked", self.__import_all)
+        import_all.set_sensitive(self._job is None)
+        button_box.add(import_all)
+        self.import_buttons.append(import_all)
+        grid.attach(button_box, 0, len(FILTER_COLUMNS), 2, 1)
+        return grid
+
+    def __create_match_gui(self):
+        """
+        Create the controls for matching untagged places to the gazetteer.
+        """
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+        box.set_margin_top(5)
+
+        description = Gtk.Label(
+            _(
+                "Tag places without a GBPN ID with the gazetteer place they most "
+                "likely are, by name, county and coordinates"
+            )
+        )
+        description.set_halign(Gtk.Align.START)
+        description.set_line_wrap(True)
+
+        self.match_hierarchy_check = Gtk.CheckButton(
+            label=_("Also replace their enclosing places with the GBPN hierarchy")
+        )
+
+        button_box = Gtk.ButtonBox()
+        button_box.set_layout(Gtk.ButtonBoxStyle.START)
+        match = Gtk.Button(label=_("Match untagged places"))
+        match.connect("clicked", self.__match_places)
+        match.set_sensitive(self._job is None)
+        button_box.add(match)
+        self.import_buttons.append(match)
+
+        box.pack_start(description, False, True, 0)
+        box.pack_start(self.match_hierarchy_check, False, True, 0)
+        box.pack_start(button_box, False, True, 0)
+        return box
+
     def main(self):
         pass
 
-    def __get_places(self, obj):
-        count = 0
+    def db_changed(self):
+        """
+        Drop the place index of the previous database; the next import creates one.
+        """
+        self.__cancel_import()
+        self._place_index = None
+        self._importer = None
+
+    def __ensure_importer(self) -> None:
+        """
+        Create the place index and importer for the open database, and keep the
+        index in step with it.
+        """
+        if self._importer is not None:
+            return
+        self.__load_preferences()
+
+        db = self.dbstate.db
+        self._place_index = PlaceIndex(db)
+        self._importer = self.__create_importer()
+        self.connect(db, "place-add", self._place_index.update)
+        self.connect(db, "place-update", self._place_index.update)
+        self.connect(db, "place-delete", self._place_index.remove)
+        self.connect(db, "place-rebuild", self._place_index.reset)
+        self.connect(db, "place-delete", self._importer.forget_hierarchy)
+        self.connect(db, "place-rebuild", self._importer.forget_hierarchy)
+
+    def __load_preferences(self) -> None:
+        if self._preferences_loaded:
+            return
+        config = get_config()
+        self._alternative_names_enabled = config.get(
+            INI_PREFERENCES_ALTERNATIVE_NAMES_ENABLED
+        )
+        self._hierarchy_enabled = config.get(INI_PREFERENCES_HIERARCHY_ENABLED)
+        self._hierarchy_historic = config.get(INI_HIERARCHY_HISTORIC)
+        self._hierarchy_admin = config.get(INI_HIERARCHY_ADMIN)
+        self._hierarchy_modern = config.get(INI_HIERARCHY_MODERN)
+        self._hierarchy_civil_parish = config.get(INI_HIERARCHY_CIVIL_PARISH)
+        self._strip_civil_parish_suffix = config.get(
+            INI_PREFERENCES_STRIP_CIVIL_PARISH_SUFFIX
+        )
+        self._transaction_size = config.get(INI_PREFERENCES_TRANSACTION_SIZE)
+        self._profile = config.get(INI_PREFERENCES_PROFILE)
+        self._preferences_loaded = True
 
-        self._gbpn_id = self.gbpn_id_entry.get_text()
+    def __create_importer(
+        self, dry_run: bool = False, hierarchy_enabled: Optional[bool] = None
+    ) -> PlaceImporter:
+        """
+        Create an importer over the place index, using the preferences unless
+        ``hierarchy_enabled`` is given.
+        """
+        return PlaceImporter(
+            self.dbstate.db,
+            self._place_index,
+            alternative_names_enabled=self._alternative_names_enabled,
+            hierarchy_enabled=(
+                self._hierarchy_enabled
+                if hierarchy_enabled is None
+                else hierarchy_enabled
+            ),
+            hierarchy_historic=self._hierarchy_historic,
+            hierarchy_admin=self._hierarchy_admin,
+            hierarchy_modern=self._hierarchy_modern,
+            hierarchy_civil_parish=self._hierarchy_civil_parish,
+            strip_civil_parish_suffix=self._strip_civil_parish_suffix,
+            profile=bool(self._profile),
+            dry_run=dry_run,
+        )
 
-        if self._gbpn_id == "" or not self._gbpn_id.isdigit():
+    def __get_places(self, obj):
+        gbpn_ids = parse_gbpn_ids(self.gbpn_id_entry.get_text())
+
+        if not gbpn_ids:
             self.errors_label.set_text(_("Please enter a valid GBPN ID"))
             return
 
-        csv_path = Path(__file__).parent / "GBPN.csv"
-        if not csv_path.exists():
-            LOG.warning("File not found: %s", csv_path)
-            self.errors_label.set_text(
-                _("File not found: %(file_name)s") % {"file_name": csv_path}
-            )
+        if not self.__ensure_gazetteer():
             return
+        self.__ensure_importer()
 
         LOG.debug(
-            "Starting import from %s for GBPN ID: %s",
-            csv_path,
-            self._gbpn_id,
+            "Starting import from %s for %d GBPN ID(s): %s",
+            self._gazetteer.csv_path,
+            len(gbpn_ids),
+            ", ".join(gbpn_ids),
         )
 
-        self.errors_label.set_text("")
+        gazetteer = self._gazetteer
 
-        with open(csv_path, encoding="utf-8-sig") as csvfile:
-            reader = csv.DictReader(csvfile)
-
-            for row in reader:
-                gbpn_id = row.get("GBPNID", "")
-                name_type = row.get("NameType", "").upper()
-
-                if gbpn_id != self._gbpn_id or name_type != "P":
-                    continue
-
-                place_name = row.get("PlaceName", "")
-                gbpn_url = row.get("GBPN_URL", "")
-                latitude = row.get("Lat", "")
-                longitude = row.get("Lng", "")
-                place_type = row.get("Type", "")
-                alternative_names = row.get("Alternative_Name", "")
-
-                with DbTxn(
-                    _("Handle GBPN place: %(place_name)s (%(gbpn_id)s)")
-                    % {"place_name": place_name, "gbpn_id": gbpn_id},
-                    self.dbstate.db,
-                ) as trans:
-                    __, place = self.__ensure_place(
-                        self.dbstate.db, trans, name=place_name, place_type=place_type
-                    )
-
-                    # Set type
-                    if (
-                        place.get_type() is None
-                        or place.get_type() == PlaceType.UNKNOWN
-                    ):
-                        place.set_type(place_type)
-                        LOG.debug(" - Set type: %s", place_type.value)
-
-                    # Coordinates
-                    if (
-                        (place.get_latitude() == "" or place.get_longitude() == "")
-                        and latitude
-                        and longitude
-                    ):
-                        place.set_latitude(latitude)
-                        place.set_longitude(longitude)
-                        LOG.debug(" - Set coordinates: %s, %s", latitude, longitude)
-
-                    # GBPN URL
-                    if gbpn_url:
-                        add_url = True
-                        for u in place.get_url_list():
-                            if u.get_type() == "GBPN URL" and u.get_description() == (
-                                _("Gazetteer of British Place Names (ID: %(gbpn_id)s)")
-                                % {"gbpn_id": gbpn_id},
-                            ):
-                                add_url = False
-                                break
-
-                        existing_urls = {
-                            u.get_path()
-                            for u in place.get_url_list()
-                            if u.get_type() == "GBPN URL"
-                        }
-
-                        if add_url and gbpn_url not in existing_urls:
-                            url = self.__get_gbpn_url(gbpn_url, gbpn_id)
-                            place.add_url(url)
-                            LOG.debug(" - Added GBPN URL: %s", gbpn_url)
-
-                    # Alternative names
-                    if self._alternative_names_enabled:
-                        existing_names = {
-                            n.get_value() for n in place.get_alternative_names()
-                        }
-                        for alternative_name in [
-                            n for n in alternative_names.split(",") if n
-                        ]:
-                            if alternative_name not in existing_names:
-                                place.add_alternative_name(alternative_name)
-                                LOG.debug(
-                                    " - Added alternative name: '%s' to place: '%s'",
-                                    alternative_name,
-                                    place_name,
-                                )
-                            else:
-                                LOG.debug(
-                                    " - Skipped existing alternative name: '%s'",
-                                    alternative_name,
-                                )
-
-                    original_enclosing_places = place.get_placeref_list().copy()
-                    top = place
-                    if self._hierarchy_enabled:
-                        top = self.__generate_hierarchy(trans, place, row) or place
-                    top.set_placeref_list(original_enclosing_places)
-
-                    self.dbstate.db.commit_place(place, trans)
-                    count += 1
+        def read_rows(job: ImportJob) -> list[GazetteerRow]:
+            rows = get_place_rows(gazetteer, gbpn_ids)
+            job.total = len(rows)
+            return rows
 
-        self.errors_label.set_text(
-            _("Finished import: %(imported)d place(s) processed") % {"imported": count}
+        def report_missing(job: ImportJob) -> Optional[str]:
+            missing = [gbpn_id for gbpn_id in gbpn_ids if gbpn_id not in job.gbpn_ids]
+            if not missing:
+                return None
+            LOG.warning("GBPN ID(s) not found: %s", ", ".join(missing))
+            return _("%(missing)d ID(s) not found") % {"missing": len(missing)}
+
+        self.__start_import(
+            ImportJob(read_rows, self._transaction_size), report_missing
         )
-        LOG.debug("Finished import: %d place(s) processed", count)
 
-    # -------------------
-    # Helpers
-    # -------------------
+    def __import_all(self, obj):
+        """
+        Stream the whole gazetteer, optionally filtered, into the database.
+        """
+        filters = {
+            column: entry.get_text() for column, entry in self.filter_entries.items()
+        }
 
-    @staticmethod
-    def __get_or_create_place(
-        db: DbWriteBase, name: str, place_type: int, parent_handle=None
-    ) -> Place:
-        for place in db.iter_places():
-            if name == place.get_name().get_value() and place_type == place.get_type():
-                return place
-
-        new_place = Place()
-        new_place_name = PlaceName()
-        new_place_name.set_value(name)
-        new_place.set_name(new_place_name)
-        new_place.set_type(place_type)
-
-        if parent_handle is not None:
-            parent_ref = PlaceRef()
-            parent_ref.set_reference_handle(parent_handle)
-            new_place.add_placeref(parent_ref)
-
-        return new_place
+        if not self.__ensure_gazetteer():
+            return
+        self.__ensure_importer()
+
+        if not any(value.strip() for value in filters.values()) and not (
+            QuestionDialog2(
+                _("Import the whole gazetteer?"),
+                _(
+                    "No filter is set, so every place in the Gazetteer of British "
+                    "Place Names will be imported. This can take a long time."
+                ),
+                _("_Import"),
+                _("_Cancel"),
+                parent=self.uistate.window,
+            ).run()
+        ):
+            return
 
-    @staticmethod
-    def __normalize_parish_name(name: str, strip_suffix: bool = True) -> str:
-        """Strip 'CP' from CivilParish names and trim whitespace."""
-        if strip_suffix and name.endswith(" CP"):
-            name = name[:-3]
-        return name
+        LOG.debug(
+            "Starting full import from %s with filters: %s",
+            self._gazetteer.csv_path,
+            filters,
+        )
 
-    @staticmethod
-    def __find_existing_place(
-        db: DbReadBase, name: str, gbpn_id: str
-    ) -> Optional[Place]:
-        if gbpn_id:
-            for place in db.iter_places():
-                for url in place.get_url_list():
-                    if url.get_type() == "GBPN URL" and url.get_description() == (
-                        _("Gazetteer of British Place Names (ID: %(gbpn_id)s)")
-                        % {"gbpn_id": gbpn_id},
-                    ):
-                        return place
-        for place in db.iter_places():
-            if place.get_name().get_value() == name:
-                return place
-        return None
-
-    def __generate_hierarchy(self, trans: DbTxn, place: Place, row: dict):
-        """
-        Build hierarchy with explicit PlaceTypes and time-scoped parents:
-
-          United Kingdom [COUNTRY]
-            -> Region [STATE]
-              -> Historic County [COUNTY] (before 1889-01-01) (there can be multiple)
-              -> Administrative County [COUNTY] (from 1889-01-01 to 1974-01-01)
-                  -> District [DISTRICT] (same admin period)
-              -> Unitary Authority [COUNTY] (after 1974-01-01)
-                  -> Parish [PARISH] (if CivilParish exists; also under the Administrative County path if applicable)
+        gazetteer = self._gazetteer
+
+        def read_rows(job: ImportJob) -> Iterator[GazetteerRow]:
+            for row in gazetteer.iter_rows(
+                job.set_read_fraction, filters=filters, name_type="P"
+            ):
+                if job.cancelled:
+                    return
+                yield row
+
+        self.__start_import(
+            ImportJob(read_rows, self._transaction_size or BULK_TRANSACTION_SIZE)
+        )
+
+    def __sync_places(self, obj):
         """
-        db = self.dbstate.db
+        Refresh the places tagged with a GBPN ID from the current gazetteer.
+        """
+        if not self.__ensure_gazetteer():
+            return
+        self.__ensure_importer()
 
-        # CSV fields
-        region = row.get("Region", "")
-        historic_county_raw = row.get("HistCounty", "")
-        ad_county = row.get("AdCounty", "")
-        district = row.get("District", "")
-        uni_auth = row.get("UniAuth", "")
-        civil_parish_raw = row.get("CivilParish", "")
-        civil_parish = (
-            self.__normalize_parish_name(
-                civil_parish_raw, self._strip_civil_parish_suffix
-            )
-            if civil_parish_raw
-            else ""
+        # Collected here, since building the index reads the database
+        gbpn_ids = self._place_index.get_indexed_gbpn_ids()
+        if not gbpn_ids:
+            self.errors_label.set_text(_("No places are tagged with a GBPN ID"))
+            return
+
+        LOG.debug(
+            "Starting sync from %s for %d GBPN ID(s)",
+            self._gazetteer.csv_path,
+            len(gbpn_ids),
         )
 
-        # 1) United Kingdom (COUNTRY)
-        uk_handle, uk_place = self.__ensure_place(
-            db,
-            trans,
-            name="United Kingdom",
-            place_type=PlaceType.COUNTRY,
-            parent_handle=None,
+        gazetteer = self._gazetteer
+
+        def read_rows(job: ImportJob) -> Iterator[GazetteerRow]:
+            for row in iter_sync_rows(gazetteer, gbpn_ids, job.set_read_fraction):
+                if job.cancelled:
+                    return
+                yield row
+
+        def report_changes(job: ImportJob) -> str:
+            message = _("%(changed)d place(s) changed, %(unchanged)d unchanged") % {
+                "changed": self._job_importer.counters["places_changed"],
+                "unchanged": self._job_importer.counters["places_unchanged"],
+            }
+            missing = len(gbpn_ids - job.gbpn_ids)
+            if missing:
+                LOG.warning(
+                    "GBPN ID(s) not in the gazetteer: %s",
+                    ", ".join(sorted(gbpn_ids - job.gbpn_ids)),
+                )
+                message += "\n" + _("%(missing)d ID(s) not found in the gazetteer") % {
+                    "missing": missing
+                }
+            return message
+
+        self.__start_import(
+            ImportJob(read_rows, self._transaction_size or BULK_TRANSACTION_SIZE),
+            report_changes,
+            sync=True,
         )
 
-        # 2) Region (STATE) under UK  (use PlaceType.REGION if available in your Gramps build)
-        region_handle = uk_handle
-        if region:
-            region_handle, _ = self.__ensure_place(
-                db,
-                trans,
-                name=region,
-                place_type=PlaceType.COUNTRY,
-                parent_handle=uk_handle,
-            )
+    def __match_places(self, obj):
+        """
+        Tag untagged places with the gazetteer places they were matched to.
+        """
+        if not self.__ensure_gazetteer():
+            return
+        self.__ensure_importer()
 
-        # 3) Historic County [COUNTY] under Region (supports multiple, slash-separated)
-        hist_parent_handles: list[str] = []
-        if self._hierarchy_historic and historic_county_raw:
-            parts = [p.strip() for p in historic_county_raw.split("/") if p.strip()]
-            # de-duplicate while preserving order
-            seen = set()
-            hist_names = [p for p in parts if not (p in seen or seen.add(p))]
-            for hist_name in hist_names:
-                h_handle, _ = self.__ensure_place(
-                    db,
-                    trans,
-                    name=hist_name,
-                    place_type=PlaceType.COUNTY,
-                    parent_handle=region_handle,
-                )
-                hist_parent_handles.append(h_handle)
-
-        # 4) Admin County [COUNTY] and optional District [DISTRICT] under Region
-        admin_parent_handle = None
-        district_parent_handle = None
-        if self._hierarchy_admin and ad_county:
-            admin_parent_handle, _ = self.__ensure_place(
-                db,
-                trans,
-                name=ad_county,
-                place_type=PlaceType.COUNTY,
-                parent_handle=region_handle,
-            )
-            if district:
-                district_parent_handle, _ = self.__ensure_place(
-                    db,
-                    trans,
-                    name=district,
-                    place_type=PlaceType.DISTRICT,
-                    parent_handle=admin_parent_handle,
-                )
+        # Collected here, since they are read from the database
+        places = collect_untagged_places(self.dbstate.db)
+        if not places:
+            self.errors_label.set_text(_("No untagged places to match"))
+            return
 
-        # 5) Unitary Authority [COUNTY] under Region
-        ua_parent_handle = None
-        if self._hierarchy_modern and uni_auth:
-            ua_parent_handle, _ = self.__ensure_place(
-                db,
-                trans,
-                name=uni_auth,
-                place_type=PlaceType.COUNTY,
-                parent_handle=region_handle,
-            )
+        LOG.debug(
+            "Matching %d untagged place(s) against %s",
+            len(places),
+            self._gazetteer.csv_path,
+        )
 
-        # 6) Parish [PARISH] (if CivilParish exists)
-        #    - Under District if present (admin path), else under Admin County
-        #    - Under Unitary Authority for the modern path
-        parish_admin_handle = None
-        parish_modern_handle = None
-        if self._hierarchy_civil_parish and civil_parish:
-            # Admin path parish
-            if district_parent_handle:
-                parish_admin_handle, _ = self.__ensure_place(
-                    db,
-                    trans,
-                    name=civil_parish,
-                    place_type=PlaceType.PARISH,
-                    parent_handle=district_parent_handle,
-                )
-            elif admin_parent_handle:
-                parish_admin_handle, _ = self.__ensure_place(
-                    db,
-                    trans,
-                    name=civil_parish,
-                    place_type=PlaceType.PARISH,
-                    parent_handle=admin_parent_handle,
-                )
+        matcher = PlaceMatcher(
+            self._gazetteer, self._place_index.get_indexed_gbpn_ids()
+        )
+        # Filled by the worker thread before each matched row is handed over
+        handles: dict[str, str] = {}
 
-            # Modern path parish
-            if ua_parent_handle:
-                parish_modern_handle, _ = self.__ensure_place(
-                    db,
-                    trans,
-                    name=civil_parish,
-                    place_type=PlaceType.PARISH,
-                    parent_handle=ua_parent_handle,
-                )
+        def read_rows(job: ImportJob) -> Iterator[GazetteerRow]:
+            for match in matcher.iter_matches(
+                places, job.set_read_fraction, lambda: job.cancelled
+            ):
+                handles[match.row.GBPNID] = match.place.handle
+                yield match.row
+
+        def report_matches(job: ImportJob) -> str:
+            counters = matcher.counters
+            return _(
+                "%(matched)d of %(places)d untagged place(s) matched, "
+                "%(ambiguous)d ambiguous"
+            ) % {
+                "matched": counters["matched"],
+                "places": counters["places"],
+                "ambiguous": counters["ambiguous"],
+            }
+
+        self.__start_import(
+            ImportJob(read_rows, self._transaction_size or BULK_TRANSACTION_SIZE),
+            report_matches,
+            places=handles,
+            importer=self.__create_importer(
+                dry_run=self.dry_run_check.get_active(),
+                hierarchy_enabled=self.match_hierarchy_check.get_active(),
+            ),
+        )
 
-        # 7) Build PlaceRefs for the current place with date ranges
-        new_refs: list[PlaceRef] = []
+    # -------------------
+    # Name search
+    # -------------------
+
+    def __search_names(self, entry):
+        """
+        Suggest gazetteer places whose name starts with the text typed so far.
+
+        The search runs on a worker thread, since the first one may have to build
+        the gazetteer store; results for outdated text are dropped.
+        """
+        self._search_generation += 1
+        generation = self._search_generation
+        text = entry.get_text()
 
-        # Historic: attach one ref per historic county
-        if self._hierarchy_historic and hist_parent_handles:
-            for h in hist_parent_handles:
-                pr = PlaceRef()
-                pr.set_reference_handle(h)
-                pr.set_date_object(
-                    self.__get_date_range(self.HISTORIC_COUNTIES_DATE_PERIOD)
+        if len(text.strip()) < SEARCH_MIN_LENGTH:
+            self.search_results.clear()
+            return
+        if not self.__ensure_gazetteer():
+            return
+
+        gazetteer = self._gazetteer
+
+        def search():
+            try:
+                results = gazetteer.search_names(text)
+            except Exception:  # the search is only a convenience
+                LOG.exception("Searching GBPN names failed")
+                results = []
+            GLib.idle_add(self.__show_search_results, generation, results)
+
+        threading.Thread(target=search, daemon=True).start()
+
+    def __show_search_results(
+        self, generation: int, results: list[tuple[str, GazetteerRow]]
+    ) -> bool:
+        if generation == self._search_generation:
+            self.search_results.clear()
+            for name, row in results:
+                self.search_results.append(
+                    [self.__get_search_label(name, row), row.GBPNID]
                 )
-                new_refs.append(pr)
+            self.search_entry.get_completion().complete()
+        return False
+
+    def __select_search_result(self, completion, model, tree_iter) -> bool:
+        """
+        Add the chosen place's ID to the ID entry.
+        """
+        gbpn_id = model[tree_iter][1]
+        gbpn_ids = parse_gbpn_ids(self.gbpn_id_entry.get_text()) or []
+        if gbpn_id not in gbpn_ids:
+            gbpn_ids.append(gbpn_id)
+        self.gbpn_id_entry.set_text(", ".join(gbpn_ids))
 
-        # Administrative (1889-01-01 to 1974-01-01): deepest parent available
-        admin_deepest = (
-            parish_admin_handle or district_parent_handle or admin_parent_handle
+        self._search_generation += 1
+        self.search_entry.set_text("")
+        self.search_results.clear()
+        return True
+
+    @staticmethod
+    def __get_search_label(name: str, row: GazetteerRow) -> str:
+        """
+        Describe a search result as its name, county context and ID.
+        """
+        context = []
+        for value in (row.HistCounty, row.UniAuth):
+            if value and value not in context:
+                context.append(value)
+        if row.PlaceName and row.PlaceName != name:
+            context.insert(0, row.PlaceName)
+        if context:
+            name = "%s (%s)" % (name, ", ".join(context))
+        return "%s – %s" % (name, row.GBPNID)
+
+    # -------------------
+    # Import jobs
+    # -------------------
+
+    def __start_import(
+        self,
+        job: ImportJob,
+        on_finish: Optional[Callable[[ImportJob], Optional[str]]] = None,
+        sync: bool = False,
+        places: Optional[dict[str, str]] = None,
+        importer: Optional[PlaceImporter] = None,
+    ) -> None:
+        """
+        Read rows for a job in the background and write them from the main loop.
+
+        ``on_finish`` may return an extra line for the status message. With
+        ``sync`` set, the rows only refresh places already tagged with their IDs.
+        ``places`` and ``importer`` are passed on to :meth:`PlaceImporter.run`, and
+        replace the shared importer (or its dry run copy).
+        """
+        if self._job is not None:
+            return
+
+        self.__ensure_importer()
+
+        self._job = job
+        self._job_started = time.perf_counter()
+        if importer is not None:
+            self._job_importer = importer
+        elif self.dry_run_check.get_active():
+            self._job_importer = self.__create_importer(dry_run=True)
+        else:
+            self._job_importer = self._importer
+        self._job_importer.start()
+        self.errors_label.set_text("")
+        self.__set_running(True)
+        self.__update_progress(job)
+
+        job.start()
+        GLib.timeout_add(
+            POLL_INTERVAL, self.__poll_import, job, on_finish, sync, places
         )
-        if self._hierarchy_admin and admin_deepest:
-            pr = PlaceRef()
-            pr.set_reference_handle(admin_deepest)
-            pr.set_date_object(
-                self.__get_date_range(self.ADMINISTRATIVE_COUNTIES_DATE_PERIOD)
-            )
-            new_refs.append(pr)
 
-        # Modern (after 1974-01-01): deepest parent available (prefer parish under UA)
-        modern_deepest = parish_modern_handle or ua_parent_handle
-        if self._hierarchy_modern and modern_deepest:
-            pr = PlaceRef()
-            pr.set_reference_handle(modern_deepest)
-            pr.set_date_object(self.__get_date_range(self.MODERN_REGIONS_DATE_PERIOD))
-            new_refs.append(pr)
+    def __poll_import(
+        self,
+        job: ImportJob,
+        on_finish,
+        sync: bool,
+        places: Optional[dict[str, str]],
+    ) -> bool:
+        """
+        Write the next chunk read by the job, if any; runs on the main loop.
+        """
+        if not job.cancelled:
+            chunk = job.next_chunk()
+            if chunk:
+                try:
+                    job.commits += self._job_importer.import_rows(chunk, sync, places)
+                except Exception as err:  # reported to the user by __finish_import
+                    # Escaping would remove this callback and leave the job running
+                    LOG.exception("Importing GBPN rows failed")
+                    job.error = err
+                    job.cancel()
+                    self.__finish_import(job, on_finish)
+                    return False
+                job.count += len(chunk)
+                job.gbpn_ids.update(row.GBPNID for row in chunk)
+                LOG.debug("Imported %d place(s)", job.count)
+            self.__update_progress(job)
+            if not job.done:
+                return True
+
+        self.__finish_import(job, on_finish)
+        return False
+
+    def __finish_import(self, job: ImportJob, on_finish) -> None:
+        self._job = None
+        self.__set_running(False)
+
+        elapsed = time.perf_counter() - self._job_started
+        rate = job.count / elapsed if elapsed else 0.0
+
+        if job.error is not None:
+            message = _("Import failed: %(error)s") % {"error": job.error}
+        elif job.cancelled:
+            message = _("Import cancelled: %(imported)d place(s) processed") % {
+                "imported": job.count
+            }
+        else:
+            message = _(
+                "Finished import: %(imported)d place(s) processed "
+                "in %(seconds).1f s (%(rate).0f places/s)"
+            ) % {"imported": job.count, "seconds": elapsed, "rate": rate}
+            extra = on_finish(job) if on_finish is not None else None
+            if extra:
+                message += "\n" + extra
+
+        importer = self._job_importer
+        timings = importer.timings
+        counters = importer.counters
+        if job.error is None and importer.dry_run:
+            message += "\n" + _(
+                "Dry run, nothing was written. Planned: %(plan)s; "
+                "%(commits)d commit(s); match %(match).1f s, "
+                "hierarchy %(hierarchy).1f s"
+            ) % {
+                "plan": importer.plan.get_summary(),
+                "commits": counters["commits"],
+                "match": timings["match"],
+                "hierarchy": timings["hierarchy"],
+            }
+        elif job.error is None:
+            message += "\n" + _(
+                "%(created)d place(s) created, %(reused)d reused, "
+                "%(commits)d commit(s); match %(match).1f s, "
+                "hierarchy %(hierarchy).1f s, commit %(commit).1f s"
+            ) % {
+                "reused": counters["places_reused"],
+                "created": counters["places_created"],
+                "commits": counters["commits"],
+                "match": timings["match"],
+                "hierarchy": timings["hierarchy"],
+                "commit": timings["commit"],
+            }
+
+        self.errors_label.set_text(message)
+        LOG.info(
+            "Finished %s: %d place(s) processed in %.1f s (%.0f places/s): %s",
+            "dry run" if importer.dry_run else "import",
+            job.count,
+            elapsed,
+            rate,
+            format_stats(timings, counters),
+        )
+        if importer.dry_run:
+            for line in importer.plan.get_lines():
+                LOG.info("Dry run: %s", line)
+
+        profile_path = get_profile_path()
+        if importer.dump_profile(profile_path):
+            LOG.info("Wrote import profile to %s", profile_path)
+
+    def __cancel_import(self, obj=None):
+        if self._job is not None:
+            self._job.cancel()
+
+    def __set_running(self, running: bool) -> None:
+        for button in self.import_buttons:
+            button.set_sensitive(not running)
+        self.progress_box.set_visible(running)
+
+    def __update_progress(self, job: ImportJob) -> None:
+        self.progress_bar.set_fraction(job.get_fraction())
+        self.progress_bar.set_text(
+            _("%(imported)d place(s) imported") % {"imported": job.count}
+        )
 
-        # Fallback: if nothing above, at least attach to Region (no date)
-        if not new_refs and region_handle and region_handle != uk_handle:
-            pr = PlaceRef()
-            pr.set_reference_handle(region_handle)
-            new_refs.append(pr)
+    def __ensure_gazetteer(self) -> bool:
+        """
+        Open the gazetteer next to the gramplet, reporting if ``GBPN.csv`` is missing.
+        """
+        csv_path = DEFAULT_CSV_PATH
+        if self._gazetteer is None:
+            self._gazetteer = get_gazetteer(csv_path)
 
-        # Apply new enclosing parents
-        place.set_placeref_list(new_refs)
+        if not self._gazetteer.exists():
+            LOG.warning("File not found: %s", csv_path)
+            self.errors_label.set_text(
+                _("File not found: %(file_name)s") % {"file_name": csv_path}
+            )
+            return False
+        return True
 
-        return uk_place
+    def __load_ids(self, obj):
+        """
+        Fill the ID entry from a text or CSV file of GBPN IDs.
+        """
+        dialog = Gtk.FileChooserDialog(
+            title=_("Load GBPN IDs"),
+            transient_for=self.uistate.window,
+            action=Gtk.FileChooserAction.OPEN,
+        )
+        dialog.add_buttons(
+            _("_Cancel"),
+            Gtk.ResponseType.CANCEL,
+            _("_Open"),
+            Gtk.ResponseType.OK,
+        )
+        file_filter = Gtk.FileFilter()
+        file_filter.set_name(_("Text and CSV files"))
+        file_filter.add_pattern("*.txt")
+        file_filter.add_pattern("*.csv")
+        dialog.add_filter(file_filter)
+
+        response = dialog.run()
+        file_name = dialog.get_filename()
+        dialog.destroy()
+        if response != Gtk.ResponseType.OK or not file_name:
+            return
 
-    @staticmethod
-    def __ensure_place(
-        db: DbWriteBase,
-        trans: DbTxn,
-        name: str,
-        place_type: int | str,
-        parent_handle: Optional[str] = None,
-    ) -> tuple[str, Place]:
-        """
-        Get an existing place by exact (name, type) or create it, ensuring the parent chain exists.
-        Returns (handle, place).
-        """
-        for handle in db.get_place_handles():
-            p = db.get_place_from_handle(handle)
-            if (
-                p.get_name()
-                and p.get_name().get_value() == name
-                and p.get_type() == place_type
-            ):
-                # Ensure this place has the requested parent (without duplicating refs)
-                if parent_handle:
-                    existing_parent_handles = {r.ref for r in p.get_placeref_list()}
-                    if parent_handle not in existing_parent_handles:
-                        pr = PlaceRef()
-                        pr.set_reference_handle(parent_handle)
-                        p.add_placeref(pr)
-                        db.commit_place(p, trans)
-                return handle, p
-
-        new_place = Place()
-        pn = PlaceName()
-        pn.set_value(name)
-        new_place.set_name(pn)
-        new_place.set_type(place_type)
-
-        if parent_handle:
-            pr = PlaceRef()
-            pr.set_reference_handle(parent_handle)
-            new_place.add_placeref(pr)
-        handle = db.add_place(new_place, trans)
-        return handle, new_place
+        try:
+            gbpn_ids = read_gbpn_ids(Path(file_name))
+        except (OSError, UnicodeDecodeError) as err:
+            LOG.warning("Unable to read %s: %s", file_name, err)
+            self.errors_label.set_text(
+                _("Unable to read %(file_name)s") % {"file_name": file_name}
+            )
+            return
 
-    @staticmethod
-    def __get_gbpn_url(value: str, gbpn_id: str) -> Url:
-        url = Url()
-        url.set_path(value)
-        url.set_type("GBPN URL")
-        url.set_description(
-            _("Gazetteer of British Place Names (ID: %(gbpn_id)s)")
-            % {"gbpn_id": gbpn_id},
+        self.gbpn_id_entry.set_text(", ".join(gbpn_ids))
+        self.errors_label.set_text(
+            _("Loaded %(count)d ID(s) from %(file_name)s")
+            % {"count": len(gbpn_ids), "file_name": file_name}
         )
-        return url
 
-    @staticmethod
-    def __get_date_range(date_str: str) -> Date:
-        return parser.parse(date_str)
+    def __export_places(self, obj):
+        """
+        Write the places tagged with a GBPN ID and their hierarchy to a file.
+        """
+        if self._job is not None:
+            return
+
+        dialog = Gtk.FileChooserDialog(
+            title=_("Export GBPN places"),
+            transient_for=self.uistate.window,
+            action=Gtk.FileChooserAction.SAVE,
+        )
+        dialog.add_buttons(
+            _("_Cancel"),
+            Gtk.ResponseType.CANCEL,
+            _("_Save"),
+            Gtk.ResponseType.OK,
+        )
+        dialog.set_do_overwrite_confirmation(True)
+        dialog.set_current_name("GBPN-places.csv")
+        formats = {}
+        for export_format, name, pattern in (
+            ("csv", _("CSV files"), "*.csv"),
+            ("geojson", _("GeoJSON files"), "*.geojson"),
+        ):
+            file_filter = Gtk.FileFilter()
+            file_filter.set_name(name)
+            file_filter.add_pattern(pattern)
+            dialog.add_filter(file_filter)
+            formats[file_filter] = export_format
+
+        def on_filter_changed(dialog, param):
+            # Keep the extension of the file name in step with the chosen format
+            name = dialog.get_current_name()
+            export_format = formats.get(dialog.get_filter())
+            if name and export_format:
+                dialog.set_current_name(
+                    str(Path(name).with_suffix(f".{export_format}"))
+                )
+
+        dialog.connect("notify::filter", on_filter_changed)
+
+        response = dialog.run()
+        file_name = dialog.get_filename()
+        selected = dialog.get_filter()
+        dialog.destroy()
+        if response != Gtk.ResponseType.OK or not file_name:
+            return
+
+        # The format follows the chosen filter, unless the file name asks for the
+        # other one
+        path = Path(file_name)
+        export_format = formats.get(selected, "csv")
+        if path.suffix.lower() in EXPORT_SUFFIXES:
+            export_format = get_export_format(path)
+        elif not path.suffix:
+            path = path.with_suffix(f".{export_format}")
+
+        job = ExportJob(PlaceExporter(self.dbstate.db), path, export_format)
+        self._job = job
+        self.errors_label.set_text("")
+        self.__set_running(True)
+        self.__update_export_progress(job)
+        GLib.idle_add(self.__poll_export, job)
+
+    def __poll_export(self, job: ExportJob) -> bool:
+        """
+        Write the next places of an export; runs on the main loop.
+        """
+        if job.step():
+            self.__update_export_progress(job)
+            return True
+
+        self._job = None
+        self.__set_running(False)
+        if job.error is not None:
+            message = _("Export failed: %(error)s") % {"error": job.error}
+        elif job.cancelled:
+            message = _("Export cancelled, %(file_name)s was not written") % {
+                "file_name": job.path
+            }
+        else:
+            message = _("Exported %(count)d place(s) to %(file_name)s") % {
+                "count": job.count,
+                "file_name": job.path,
+            }
+        self.errors_label.set_text(message)
+        return False
+
+    def __update_export_progress(self, job: ExportJob) -> None:
+        self.progress_bar.set_fraction(job.get_fraction())
+        self.progress_bar.set_text(
+            _("%(exported)d place(s) exported") % {"exported": job.count}
+        )
 
     # ======================================================
     # gramplet event handlers
     # ======================================================
 
     def on_save(self, *args, **kwargs):
+        # Nothing to write back if the preferences were never read
+        if not self._preferences_loaded:
+            return
+        config = get_config()
+
         # Preferences
-        CONFIG.set(
+        config.set(
             INI_PREFERENCES_ALTERNATIVE_NAMES_ENABLED, self._alternative_names_enabled
         )
-        CONFIG.set(INI_PREFERENCES_HIERARCHY_ENABLED, self._hierarchy_enabled)
-        CONFIG.set(
+        config.set(INI_PREFERENCES_HIERARCHY_ENABLED, self._hierarchy_enabled)
+        config.set(
             INI_PREFERENCES_STRIP_CIVIL_PARISH_SUFFIX,
             self._strip_civil_parish_suffix,
         )
+        config.set(INI_PREFERENCES_TRANSACTION_SIZE, self._transaction_size)
+        config.set(INI_PREFERENCES_PROFILE, self._profile)
 
         # Hierarchy
-        CONFIG.set(INI_HIERARCHY_ADMIN, self._hierarchy_admin)
-        CONFIG.set(INI_HIERARCHY_CIVIL_PARISH, self._hierarchy_civil_parish)
-        CONFIG.set(INI_HIERARCHY_HISTORIC, self._hierarchy_historic)
-        CONFIG.set(INI_HIERARCHY_MODERN, self._hierarchy_modern)
+        config.set(INI_HIERARCHY_ADMIN, self._hierarchy_admin)
+        config.set(INI_HIERARCHY_CIVIL_PARISH, self._hierarchy_civil_parish)
+        config.set(INI_HIERARCHY_HISTORIC, self._hierarchy_historic)
+        config.set(INI_HIERARCHY_MODERN, self._hierarchy_modern)
 
-        CONFIG.save()
+        config.save()
@@ -0,0 +1,377 @@
+"""
+GBPN command line tool, for scripted imports without the Gramps UI.
+
+Examples::
+
+    gramps -O "My Tree" -a tool -p "name=gbpn,ids=1234 5678"
+    gramps -O "My Tree" -a tool -p "name=gbpn,file=ids.txt,json=-"
+    gramps -O "My Tree" -a tool -p "name=gbpn,all=True,histcounty=Rutland"
+    gramps -O "My Tree" -a tool -p "name=gbpn,sync=True,csv=GBPN-2025.csv"
+    gramps -O "My Tree" -a tool -p "name=gbpn,file=ids.txt,dry_run=True,json=plan.json"
+    gramps -O "My Tree" -a tool -p "name=gbpn,match=True,dry_run=True,json=-"
+    gramps -O "My Tree" -a tool -p "name=gbpn,export=places.geojson"
+"""
+
+import json
+import logging
+import sys
+from pathlib import Path
+
+from gramps.gen.const import GRAMPS_LOCALE as glocale
+from gramps.gui.plug import tool
+
+from const import (
+    INI_PREFERENCES_ALTERNATIVE_NAMES_ENABLED,
+    INI_PREFERENCES_HIERARCHY_ENABLED,
+    INI_HIERARCHY_ADMIN,
+    INI_HIERARCHY_HISTORIC,
+    INI_HIERARCHY_MODERN,
+    INI_HIERARCHY_CIVIL_PARISH,
+    INI_PREFERENCES_STRIP_CIVIL_PARISH_SUFFIX,
+    INI_PREFERENCES_TRANSACTION_SIZE,
+    INI_PREFERENCES_PROFILE,
+    DOMAIN,
+)
+from gazetteer import DEFAULT_CSV_PATH, get_gazetteer, parse_gbpn_ids, read_gbpn_ids
+from importer import (
+    BULK_TRANSACTION_SIZE,
+    PlaceImporter,
+    format_stats,
+    get_place_rows,
+    iter_sync_rows,
+)
+from place_export import EXPORT_FORMATS, PlaceExporter
+from place_matcher import PlaceMatcher, collect_untagged_places
+from settings import get_config, get_profile_path
+
+try:
+    _trans = glocale.get_addon_translator(__file__)
+except ValueError:
+    _trans = glocale.translation
+_ = _trans.gettext
+
+LOG = logging.getLogger(DOMAIN)
+
+# Tool options for the gazetteer columns that whole-gazetteer imports filter on
+FILTER_OPTIONS = {
+    "region": "Region",
+    "histcounty": "HistCounty",
+    "uniauth": "UniAuth",
+}
+
+
+class GBPNTool(tool.Tool):
+    """
+    Import GBPN places by ID, or the whole (filtered) gazetteer, from the CLI.
+    """
+
+    def __init__(self, dbstate, user, options_class, name, callback=None):
+        self.user = user
+        tool.Tool.__init__(self, dbstate, options_class, name)
+        self.run_tool()
+
+    def run_tool(self) -> None:
+        options = self.options.handler.options_dict
+        try:
+            if options["export"]:
+                summary = self.__export(options)
+            else:
+                summary = self.__run(options)
+        except (OSError, UnicodeDecodeError, ValueError) as err:
+            LOG.warning("GBPN import failed: %s", err)
+            summary = {"error": str(err)}
+            self.user.notify_error(_("GBPN import failed"), str(err))
+
+        if options["json"]:
+            self.__write_json(options["json"], summary)
+
+    def __run(self, options: dict) -> dict:
+        csv_path = Path(options["csv"]) if options["csv"] else DEFAULT_CSV_PATH
+        gazetteer = get_gazetteer(csv_path)
+        if not gazetteer.exists():
+            raise OSError(_("File not found: %(file_name)s") % {"file_name": csv_path})
+
+        config = get_config()
+        importer = PlaceImporter(
+            self.db,
+            alternative_names_enabled=config.get(
+                INI_PREFERENCES_ALTERNATIVE_NAMES_ENABLED
+            ),
+            # Matched places keep their enclosing places unless asked otherwise
+            hierarchy_enabled=(
+                options["match_hierarchy"]
+                if options["match"]
+                else config.get(INI_PREFERENCES_HIERARCHY_ENABLED)
+            ),
+            hierarchy_historic=config.get(INI_HIERARCHY_HISTORIC),
+            hierarchy_admin=config.get(INI_HIERARCHY_ADMIN),
+            hierarchy_modern=config.get(INI_HIERARCHY_MODERN),
+            hierarchy_civil_parish=config.get(INI_HIERARCHY_CIVIL_PARISH),
+            strip_civil_parish_suffix=config.get(
+                INI_PREFERENCES_STRIP_CIVIL_PARISH_SUFFIX
+            ),
+            profile=config.get(INI_PREFERENCES_PROFILE),
+            dry_run=options["dry_run"],
+        )
+        transaction_size = options["transaction_size"] or config.get(
+            INI_PREFERENCES_TRANSACTION_SIZE
+        )
+
+        filters = {
+            column: options[option]
+            for option, column in FILTER_OPTIONS.items()
+            if options[option].strip()
+        }
+        gbpn_ids = self.__get_gbpn_ids(options)
+        matcher = None
+
+        if options["sync"]:
+            tagged_ids = importer.place_index.get_indexed_gbpn_ids()
+            result = importer.run(
+                iter_sync_rows(gazetteer, tagged_ids),
+                transaction_size or BULK_TRANSACTION_SIZE,
+                sync=True,
+            )
+            # Places in the tree whose ID is no longer in the gazetteer
+            missing = result.get_missing(sorted(tagged_ids, key=lambda i: (len(i), i)))
+        elif options["match"]:
+            matcher = PlaceMatcher(
+                gazetteer, importer.place_index.get_indexed_gbpn_ids()
+            )
+            handles: dict[str, str] = {}
+
+            def iter_matched_rows():
+                for match in matcher.iter_matches(collect_untagged_places(self.db)):
+                    handles[match.row.GBPNID] = match.place.handle
+                    yield match.row
+
+            result = importer.run(
+                iter_matched_rows(),
+                transaction_size or BULK_TRANSACTION_SIZE,
+                places=handles,
+            )
+            missing = []
+        elif gbpn_ids:
+            result = importer.run(get_place_rows(gazetteer, gbpn_ids), transaction_size)
+            missing = result.get_missing(gbpn_ids)
+        elif options["all"] or filters:
+            result = importer.run(
+                gazetteer.iter_rows(filters=filters, name_type="P"),
+                transaction_size or BULK_TRANSACTION_SIZE,
+            )
+            missing = []
+        else:
+            raise ValueError(
+                _(
+                    "Nothing to import: give ids, file, a filter, all=True, "
+                    "sync=True or match=True"
+                )
+            )
+
+        self.user.info(
+            _("GBPN import finished:"),
+            _(
+                "%(imported)d place(s) processed in %(seconds).1f s "
+                "(%(rate).0f places/s)"
+            )
+            % {
+                "imported": result.count,
+                "seconds": result.seconds,
+                "rate": result.rate,
+            },
+        )
+        if result.plan is not None:
+            self.user.info(
+                _("GBPN dry run, nothing was written:"),
+                _("%(plan)s; %(commits)d commit(s)")
+                % {"plan": result.plan.get_summary(), "commits": result.commits},
+            )
+        if options["sync"]:
+            self.user.info(
+                _("GBPN sync finished:"),
+                _("%(changed)d place(s) changed, %(unchanged)d unchanged")
+                % {
+                    "changed": result.counters["places_changed"],
+                    "unchanged": result.counters["places_unchanged"],
+                },
+            )
+        if matcher is not None:
+            self.user.info(
+                _("GBPN matching finished:"),
+                _(
+                    "%(matched)d of %(places)d untagged place(s) matched, "
+                    "%(ambiguous)d ambiguous"
+                )
+                % {
+                    "matched": matcher.counters["matched"],
+                    "places": matcher.counters["places"],
+                    "ambiguous": matcher.counters["ambiguous"],
+                },
+            )
+        LOG.info(
+            "Finished import: %d place(s) processed in %.1f s (%.0f places/s): %s",
+            result.count,
+            result.seconds,
+            result.rate,
+            format_stats(result.timings, result.counters),
+        )
+        profile_path = get_profile_path()
+        if importer.dump_profile(profile_path):
+            LOG.info("Wrote import profile to %s", profile_path)
+
+        if missing:
+            LOG.warning("GBPN ID(s) not found: %s", ", ".join(missing))
+            self.user.warn(
+                _("%(missing)d ID(s) not found") % {"missing": len(missing)},
+                ", ".join(missing),
+            )
+
+        summary = result.as_dict()
+        summary["missing"] = missing
+        summary["filters"] = filters
+        if matcher is not None:
+            summary["match_counters"] = dict(matcher.counters)
+            summary["matches"] = [match.as_dict() for match in matcher.matches]
+        return summary
+
+    def __export(self, options: dict) -> dict:
+        """
+        Write the places tagged with a GBPN ID and their hierarchy to a file.
+        """
+        export_format = options["export_format"].strip().lower() or None
+        if export_format is not None and export_format not in EXPORT_FORMATS:
+            raise ValueError(
+                _("Unknown export format: %(format)s") % {"format": export_format}
+            )
+        exporter = PlaceExporter(self.db)
+        count = exporter.write(Path(options["export"]), export_format)
+        self.user.info(
+            _("GBPN export finished:"),
+            _("%(exported)d place(s) written to %(file_name)s")
+            % {"exported": count, "file_name": options["export"]},
+        )
+        return {"exported": count, "counters": dict(exporter.counters)}
+
+    @staticmethod
+    def __get_gbpn_ids(options: dict) -> list[str]:
+        """
+        Collect the IDs given inline and in an ID file, keeping their order.
+        """
+        gbpn_ids = parse_gbpn_ids(options["ids"])
+        if gbpn_ids is None:
+            raise ValueError(_("Invalid GBPN IDs: %(ids)s") % {"ids": options["ids"]})
+        if options["file"]:
+            gbpn_ids += read_gbpn_ids(Path(options["file"]))
+        return list(dict.fromkeys(gbpn_ids))
+
+    @staticmethod
+    def __write_json(destination: str, summary: dict) -> None:
+        text = json.dumps(summary, indent=2)
+        if destination == "-":
+            sys.stdout.write(text + "\n")
+        else:
+            Path(destination).write_text(text + "\n", encoding="utf-8")
+
+
+class GBPNToolOptions(tool.ToolOptions):
+    """
+    Defines options and provides handling interface.
+    """
+
+    def __init__(self, name, person_id=None):
+        tool.ToolOptions.__init__(self, name, person_id)
+
+        self.options_dict = {
+            "ids": "",
+            "file": "",
+            "all": False,
+            "sync": False,
+            "dry_run": False,
+            "match": False,
+            "match_hierarchy": False,
+            "export": "",
+            "export_format": "",
+            "region": "",
+            "histcounty": "",
+            "uniauth": "",
+            "csv": "",
+            "transaction_size": 0,
+            "json": "",
+        }
+        self.options_help = {
+            "ids": (
+                "=str",
+                "GBPN IDs to import, separated by spaces or semicolons",
+                "e.g. '1234 5678'",
+            ),
+            "file": (
+                "=str",
+                "Text or CSV file of GBPN IDs to import",
+                "Path to a file with one ID per line or a GBPNID column",
+            ),
+            "all": (
+                "=True/False",
+                "Import the whole gazetteer, limited by any filters",
+                "True or False",
+            ),
+            "sync": (
+                "=True/False",
+                "Update the places already tagged with a GBPN ID from the gazetteer",
+                "True or False",
+            ),
+            "dry_run": (
+                "=True/False",
+                "Report the places, references, URLs and names an import would add, "
+                "without writing them",
+                "True or False",
+            ),
+            "match": (
+                "=True/False",
+                "Tag the places without a GBPN ID with the gazetteer places they "
+                "match by name, county and coordinates",
+                "True or False",
+            ),
+            "match_hierarchy": (
+                "=True/False",
+                "Also replace the enclosing places of matched places with the GBPN "
+                "hierarchy",
+                "True or False",
+            ),
+            "export": (
+                "=str",
+                "Write the places tagged with a GBPN ID and their enclosing places "
+                "by period to a file, instead of importing",
+                "Path to a .csv or .geojson file",
+            ),
+            "export_format": (
+                "=str",
+                "Format of the export (defaults to the file extension)",
+                "csv or geojson",
+            ),
+            "region": ("=str", "Only import places in this region", "Region name"),
+            "histcounty": (
+                "=str",
+                "Only import places in this historic county",
+                "Historic county name",
+            ),
+            "uniauth": (
+                "=str",
+                "Only import places in this unitary authority",
+                "Unitary authority name",
+            ),
+            "csv": (
+                "=str",
+                "Gazetteer to import from",
+                "Path to GBPN.csv (defaults to the one next to the addon)",
+            ),
+            "transaction_size": (
+                "=num",
+                "Places per transaction (0 for the preference)",
+                "Integer number",
+            ),
+            "json": (
+                "=str",
+                "Write the results and timings as JSON",
+                "Path to a file, or - for standard output",
+            ),
+        }
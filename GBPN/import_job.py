@@ -0,0 +1,141 @@
+"""
+Background reading of GBPN rows for imports driven from the GTK main loop.
+"""
+
+import logging
+import queue
+import threading
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional
+
+from const import DOMAIN
+from gazetteer import GazetteerRow
+
+LOG = logging.getLogger(DOMAIN)
+
+# Chunks read ahead of the database writes; bounds memory use on large imports.
+QUEUE_SIZE = 4
+
+_DONE = object()
+
+
+class ImportJob:
+    """
+    Read GBPN rows on a worker thread and hand them over in chunks.
+
+    The worker only parses and filters the gazetteer. Gramps databases are not
+    thread safe, so the chunks are consumed (and written) on the main loop by
+    polling :meth:`next_chunk`.
+    """
+
+    def __init__(
+        self,
+        read_rows: Callable[["ImportJob"], Iterable[GazetteerRow]],
+        chunk_size: int = 0,
+        total: Optional[int] = None,
+    ):
+        """
+        :param read_rows: Called on the worker thread to produce the rows. It may
+            call :meth:`set_read_fraction` to report progress and should stop
+            early once :attr:`cancelled` is set.
+        :param chunk_size: Rows per chunk, or 0 to deliver all rows as one chunk.
+        :param total: Number of rows, when known up front.
+        """
+        self._read_rows = read_rows
+        self._chunk_size = chunk_size
+        self._queue: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self.__run, daemon=True)
+        self._done = False
+
+        self.total = total
+        self.read_fraction = 0.0
+        self.error: Optional[BaseException] = None
+
+        # Updated by the consumer as chunks are written
+        self.count = 0
+        self.commits = 0
+        self.gbpn_ids: set[str] = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def set_read_fraction(self, fraction: float) -> None:
+        self.read_fraction = fraction
+
+    def get_fraction(self) -> float:
+        """
+        Return the overall progress between 0 and 1.
+        """
+        if self.total:
+            return min(self.count / self.total, 1.0)
+        return self.read_fraction
+
+    def next_chunk(self) -> Optional[list[GazetteerRow]]:
+        """
+        Return the next chunk of rows without blocking, or None if none is ready.
+
+        Once the worker has finished and every chunk was taken, :attr:`done` is set.
+        """
+        if self._done:
+            return None
+        try:
+            item = self._queue.get_nowait()
+        except queue.Empty:
+            return None
+        if item is _DONE:
+            self._done = True
+            return None
+        return item
+
+    # -------------------
+    # Worker thread
+    # -------------------
+
+    def __run(self) -> None:
+        try:
+            for chunk in self.__chunks(iter(self._read_rows(self))):
+                if not self.__put(chunk):
+                    break
+        except Exception as err:  # reported to the user by the consumer
+            LOG.exception("Reading GBPN rows failed")
+            self.error = err
+        finally:
+            self.read_fraction = 1.0
+            self.__put(_DONE)
+
+    def __chunks(self, rows: Iterator[GazetteerRow]) -> Iterator[list[GazetteerRow]]:
+        if not self._chunk_size:
+            chunk = []
+            for row in rows:
+                if self.cancelled:
+                    return
+                chunk.append(row)
+            if chunk:
+                yield chunk
+            return
+        while not self.cancelled and (chunk := list(islice(rows, self._chunk_size))):
+            yield chunk
+
+    def __put(self, item) -> bool:
+        """
+        Queue an item, giving up if the job is cancelled while the queue is full.
+        """
+        while not self.cancelled:
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -0,0 +1,895 @@
+"""
+Import of GBPN rows into a Gramps database, independent of the GUI.
+"""
+
+import cProfile
+import logging
+import time
+from collections import Counter
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+from gramps.gen.const import GRAMPS_LOCALE as glocale
+from gramps.gen.db import DbTxn, DbWriteBase
+from gramps.gen.lib import Place, PlaceName, PlaceRef, PlaceType, Url
+
+from const import DOMAIN, GBPN_URL_TYPE
+from date_ranges import get_date_range
+from gazetteer import Gazetteer, GazetteerRow
+from place_batch import PlaceBatch
+from place_index import PlaceIndex
+
+try:
+    _trans = glocale.get_addon_translator(__file__)
+except ValueError:
+    _trans = glocale.translation
+_ = _trans.gettext
+
+LOG = logging.getLogger(DOMAIN)
+
+# Places per transaction for whole-gazetteer imports when no size is configured
+BULK_TRANSACTION_SIZE = 1000
+
+# Stages of an import timed by PlaceImporter, in order
+STAGES = ("match", "update", "hierarchy", "commit")
+
+# Events counted by PlaceImporter
+COUNTERS = (
+    "rows",  # rows imported
+    "places_indexed",  # database places scanned to build the place index
+    "hierarchy_hits",  # hierarchy levels resolved from the per-import cache
+    "places_reused",  # existing places matched by GBPN ID or (name, type)
+    "places_created",
+    "places_changed",  # existing GBPN places written because their row differed
+    "places_unchanged",  # existing GBPN places left as they were
+    "commits",
+)
+
+# Parts of an existing GBPN place compared against its row, as reported in diffs
+DIFF_FIELDS = ("type", "coordinates", "url", "alternative_names", "hierarchy")
+
+# (name, type) of each place from the United Kingdom down to a hierarchy place
+HierarchyPath = tuple[tuple[str, int], ...]
+
+
+class ImportResult:
+    """
+    Outcome of an import session run by :meth:`PlaceImporter.run`.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.commits = 0
+        self.gbpn_ids: set[str] = set()
+        self.cancelled = False
+        self.seconds = 0.0
+        # Seconds spent reading rows and in each of STAGES
+        self.timings: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+        # Fields changed per GBPN ID, for existing places that were written
+        self.changes: dict[str, tuple[str, ...]] = {}
+        # What would have been written, for dry runs
+        self.plan: Optional[ImportPlan] = None
+
+    @property
+    def rate(self) -> float:
+        return self.count / self.seconds if self.seconds else 0.0
+
+    def get_missing(self, gbpn_ids: Iterable[str]) -> list[str]:
+        """
+        Return the requested IDs for which no place was imported, in order.
+        """
+        return [gbpn_id for gbpn_id in gbpn_ids if gbpn_id not in self.gbpn_ids]
+
+    def as_dict(self) -> dict:
+        """
+        Return the result as plain values, e.g. for JSON output.
+        """
+        return {
+            "imported": self.count,
+            "commits": self.commits,
+            "gbpn_ids": sorted(self.gbpn_ids, key=lambda i: (len(i), i)),
+            "cancelled": self.cancelled,
+            "seconds": round(self.seconds, 3),
+            "places_per_second": round(self.rate, 1),
+            "timings": {
+                stage: round(seconds, 3) for stage, seconds in self.timings.items()
+            },
+            "counters": dict(self.counters),
+            "changes": {
+                gbpn_id: list(fields) for gbpn_id, fields in self.changes.items()
+            },
+            "plan": self.plan.as_dict() if self.plan is not None else None,
+        }
+
+
+class ImportPlan:
+    """
+    The changes an import would make, collected by a dry run.
+
+    Places are described by name, so the plan can be reviewed without the
+    handles of places that were never written.
+    """
+
+    def __init__(self):
+        # (name, type)
+        self.new_places: list[tuple[str, str]] = []
+        # (place, enclosing place, date)
+        self.new_place_refs: list[tuple[str, str, str]] = []
+        # (place, URL)
+        self.new_urls: list[tuple[str, str]] = []
+        # (place, alternative name)
+        self.new_alternative_names: list[tuple[str, str]] = []
+
+    def get_summary(self) -> str:
+        return _(
+            "%(places)d new place(s), %(place_refs)d new enclosing place "
+            "reference(s), %(urls)d new URL(s), %(names)d new alternative name(s)"
+        ) % {
+            "places": len(self.new_places),
+            "place_refs": len(self.new_place_refs),
+            "urls": len(self.new_urls),
+            "names": len(self.new_alternative_names),
+        }
+
+    def get_lines(self) -> list[str]:
+        """
+        Describe each planned change on a line of its own, e.g. for the log.
+        """
+        return (
+            [
+                _("New place: %(name)s (%(type)s)") % {"name": name, "type": place_type}
+                for name, place_type in self.new_places
+            ]
+            + [
+                (
+                    _("New enclosing place: %(place)s in %(parent)s %(date)s")
+                    % {"place": place, "parent": parent, "date": date}
+                ).rstrip()
+                for place, parent, date in self.new_place_refs
+            ]
+            + [
+                _("New URL: %(place)s: %(url)s") % {"place": place, "url": url}
+                for place, url in self.new_urls
+            ]
+            + [
+                _("New alternative name: %(place)s: %(name)s")
+                % {"place": place, "name": name}
+                for place, name in self.new_alternative_names
+            ]
+        )
+
+    def as_dict(self) -> dict:
+        """
+        Return the plan as plain values, e.g. for JSON output.
+        """
+        return {
+            "new_places": [
+                {"name": name, "type": place_type}
+                for name, place_type in self.new_places
+            ],
+            "new_place_refs": [
+                {"place": place, "enclosed_by": parent, "date": date}
+                for place, parent, date in self.new_place_refs
+            ],
+            "new_urls": [{"place": place, "url": url} for place, url in self.new_urls],
+            "new_alternative_names": [
+                {"place": place, "name": name}
+                for place, name in self.new_alternative_names
+            ],
+        }
+
+
+def format_stats(timings: dict[str, float], counters: dict[str, int]) -> str:
+    """
+    Return timings and counters as one line of ``name=value`` pairs, for logging.
+    """
+    return " ".join(
+        [f"{stage}={seconds:.3f}s" for stage, seconds in timings.items()]
+        + [f"{name}={value}" for name, value in counters.items()]
+    )
+
+
+def get_place_rows(gazetteer: Gazetteer, gbpn_ids: Iterable[str]) -> list[GazetteerRow]:
+    """
+    Return the rows to import for the given GBPN IDs: their primary (``P``) names.
+    """
+    return gazetteer.get_rows_for_ids(gbpn_ids, name_type="P")
+
+
+def iter_sync_rows(
+    gazetteer: Gazetteer,
+    gbpn_ids: set[str],
+    progress: Optional[Callable[[float], None]] = None,
+) -> Iterator[GazetteerRow]:
+    """
+    Yield the rows to sync the given GBPN IDs with: their primary (``P``) names.
+
+    The IDs, usually :meth:`PlaceIndex.get_indexed_gbpn_ids` of the tree, are
+    joined with the gazetteer in a single pass over its rows.
+    """
+    if not gbpn_ids:
+        return iter(())
+    return gazetteer.iter_rows(progress, name_type="P", gbpn_ids=gbpn_ids)
+
+
+class PlaceImporter:
+    """
+    Create or update Gramps places from GBPN rows, with their hierarchy.
+
+    The importer holds no GUI state, so it is shared by the gramplet and scripted
+    imports. Hierarchy places (regions, counties, parishes...) are resolved once
+    per import session, started by :meth:`start`. Over a session, the time spent
+    in each of :data:`STAGES` is added up in :attr:`timings`, the events in
+    :data:`COUNTERS` in :attr:`counters`, and the :data:`DIFF_FIELDS` changed on
+    existing places in :attr:`changes`. Places are only written when something
+    changed. With ``profile`` set, the import work is also profiled until
+    :meth:`dump_profile` is called.
+
+    A sync (``sync=True``) refreshes places already tagged with a GBPN ID from a
+    newer gazetteer: rows without such a place are skipped rather than creating
+    one, and coordinates are replaced when they differ instead of only being filled
+    in. Alternative names are only ever added.
+
+    Rows can also be imported into chosen places, e.g. untagged places matched to
+    them by :class:`place_matcher.PlaceMatcher`, by passing their handles by GBPN
+    ID as ``places``.
+
+    A dry run (``dry_run=True``) goes through the same steps against a copy of the
+    place index, but writes nothing: the changes are collected in :attr:`plan`
+    instead, and the commits counted are the ones an import would make.
+    """
+
+    HISTORIC_COUNTIES_DATE_PERIOD = "before 1889-01-01"
+    ADMINISTRATIVE_COUNTIES_DATE_PERIOD = "from 1889-01-01 to 1974-01-01"
+    MODERN_REGIONS_DATE_PERIOD = "after 1974-01-01"
+
+    # Translated once; formatted with the GBPN ID of each imported place
+    GBPN_URL_DESCRIPTION = _("Gazetteer of British Place Names (ID: %(gbpn_id)s)")
+
+    def __init__(
+        self,
+        db: DbWriteBase,
+        place_index: Optional[PlaceIndex] = None,
+        alternative_names_enabled: bool = True,
+        hierarchy_enabled: bool = True,
+        hierarchy_historic: bool = True,
+        hierarchy_admin: bool = True,
+        hierarchy_modern: bool = True,
+        hierarchy_civil_parish: bool = True,
+        strip_civil_parish_suffix: bool = False,
+        profile: bool = False,
+        dry_run: bool = False,
+    ):
+        self.db = db
+        self.place_index = place_index if place_index is not None else PlaceIndex(db)
+        self.dry_run = dry_run
+        if dry_run:
+            # Planned places must not leak into the index of the tree
+            self.place_index = self.place_index.copy()
+        self._alternative_names_enabled = alternative_names_enabled
+        self._hierarchy_enabled = hierarchy_enabled
+        self._hierarchy_historic = hierarchy_historic
+        self._hierarchy_admin = hierarchy_admin
+        self._hierarchy_modern = hierarchy_modern
+        self._hierarchy_civil_parish = hierarchy_civil_parish
+        self._strip_civil_parish_suffix = strip_civil_parish_suffix
+
+        # Hierarchy places resolved during the current session, keyed by their path
+        self._hierarchy_nodes: dict[HierarchyPath, str] = {}
+        self.timings: dict[str, float] = dict.fromkeys(STAGES, 0.0)
+        self.counters: dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self.changes: dict[str, tuple[str, ...]] = {}
+        self.plan: Optional[ImportPlan] = None
+        # Holds the planned places across the chunks of a dry run
+        self._dry_run_batch: Optional[PlaceBatch] = None
+        self._indexed_at_start = 0
+        self._profiler = cProfile.Profile() if profile else None
+
+    def start(self) -> None:
+        """
+        Start a new import session, forgetting resolved places, timings and counts.
+        """
+        self._hierarchy_nodes.clear()
+        self.timings = dict.fromkeys(STAGES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.changes = {}
+        self._indexed_at_start = self.place_index.scanned
+        if self.dry_run:
+            self.plan = ImportPlan()
+            self._dry_run_batch = PlaceBatch(self.db, None)
+
+    def forget_hierarchy(self, *args) -> None:
+        """
+        Forget the hierarchy places resolved so far, e.g. after places were deleted.
+
+        Accepts (and ignores) the arguments of the database signals.
+        """
+        self._hierarchy_nodes.clear()
+
+    def run(
+        self,
+        rows: Iterable[GazetteerRow],
+        chunk_size: int = 0,
+        cancelled: Optional[Callable[[], bool]] = None,
+        sync: bool = False,
+        places: Optional[dict[str, str]] = None,
+    ) -> "ImportResult":
+        """
+        Import rows in a new session, one transaction per chunk, and report on it.
+
+        :param chunk_size: Rows per transaction, or 0 for a single transaction.
+        :param cancelled: Checked between chunks; the import stops once it is true.
+        :param sync: Only refresh places already tagged with the rows' GBPN IDs.
+        :param places: Handles of the places to import rows into, by GBPN ID. It
+            is read as the rows are imported, so it may be filled while they are
+            produced.
+        """
+        self.start()
+        result = ImportResult()
+        started = time.perf_counter()
+        read = 0.0
+        rows = iter(rows)
+        while cancelled is None or not cancelled():
+            reading = time.perf_counter()
+            chunk = list(islice(rows, chunk_size) if chunk_size else rows)
+            read += time.perf_counter() - reading
+            if not chunk:
+                break
+            result.commits += self.import_rows(chunk, sync, places)
+            result.count += len(chunk)
+            result.gbpn_ids.update(row.GBPNID for row in chunk)
+            LOG.debug("Imported %d place(s)", result.count)
+        else:
+            result.cancelled = True
+
+        result.seconds = time.perf_counter() - started
+        result.timings = {"read": read, **self.timings}
+        result.counters = dict(self.counters)
+        result.changes = dict(self.changes)
+        result.plan = self.plan
+        return result
+
+    def import_rows(
+        self,
+        rows: Iterable[GazetteerRow],
+        sync: bool = False,
+        places: Optional[dict[str, str]] = None,
+    ) -> int:
+        """
+        Import rows in one transaction and return the number of place commits.
+
+        :param sync: Only refresh places already tagged with the rows' GBPN IDs.
+        :param places: Handles of the places to import rows into, by GBPN ID,
+            rather than the places tagged with the IDs or named like the rows.
+        """
+        rows = list(rows)
+        if self.dry_run:
+            return self.__plan_rows(rows, sync, places)
+        if self._profiler is not None:
+            self._profiler.enable()
+        try:
+            with DbTxn(self.__get_transaction_title(rows, sync), self.db) as trans:
+                batch = PlaceBatch(self.db, trans)
+                for row in rows:
+                    self.__import_row(batch, row, sync, places)
+                started = time.perf_counter()
+                commits = batch.flush()
+            # Includes writing the transaction
+            self.timings["commit"] += time.perf_counter() - started
+        except Exception:
+            # Cached and indexed places may not have been written
+            self.forget_hierarchy()
+            self.place_index.reset()
+            raise
+        finally:
+            if self._profiler is not None:
+                self._profiler.disable()
+
+        counters = self.counters
+        counters["rows"] += len(rows)
+        counters["commits"] += commits
+        counters["places_indexed"] = self.place_index.scanned - self._indexed_at_start
+        return commits
+
+    def __plan_rows(
+        self, rows: list[GazetteerRow], sync: bool, places: Optional[dict[str, str]]
+    ) -> int:
+        """
+        Go through an import of rows without writing, returning the commits planned.
+        """
+        if self._profiler is not None:
+            self._profiler.enable()
+        try:
+            for row in rows:
+                self.__import_row(self._dry_run_batch, row, sync, places)
+            commits = self._dry_run_batch.discard()
+        finally:
+            if self._profiler is not None:
+                self._profiler.disable()
+
+        counters = self.counters
+        counters["rows"] += len(rows)
+        counters["commits"] += commits
+        counters["places_indexed"] = self.place_index.scanned - self._indexed_at_start
+        return commits
+
+    def dump_profile(self, path: Path) -> bool:
+        """
+        Write the profile of the imports so far to ``path``, if profiling.
+
+        The profile is reset afterwards, so each dump covers one import.
+        """
+        if self._profiler is None:
+            return False
+        self._profiler.dump_stats(path)
+        self._profiler = cProfile.Profile()
+        return True
+
+    @staticmethod
+    def __get_transaction_title(rows: list[GazetteerRow], sync: bool = False) -> str:
+        if sync:
+            return _("Sync %(count)d GBPN places") % {"count": len(rows)}
+        if len(rows) == 1:
+            return _("Handle GBPN place: %(place_name)s (%(gbpn_id)s)") % {
+                "place_name": rows[0].PlaceName,
+                "gbpn_id": rows[0].GBPNID,
+            }
+        return _("Import %(count)d GBPN places") % {"count": len(rows)}
+
+    def __import_row(
+        self,
+        batch: PlaceBatch,
+        row: GazetteerRow,
+        sync: bool = False,
+        places: Optional[dict[str, str]] = None,
+    ) -> None:
+        """
+        Create or update the place described by a GBPN row, with its hierarchy.
+
+        The place is only written if it is new or one of :data:`DIFF_FIELDS`
+        changed.
+        """
+        gbpn_id = row.GBPNID
+        place_name = row.PlaceName
+        gbpn_url = row.GBPN_URL
+        latitude = row.Lat
+        longitude = row.Lng
+        place_type = row.Type
+        alternative_names = row.Alternative_Name
+        timings = self.timings
+        started = time.perf_counter()
+
+        # Prefer the place chosen for the row, then one tagged with its GBPN ID
+        existing_handle = places.get(gbpn_id) if places else None
+        if existing_handle is None:
+            existing_handle = self.place_index.find_by_gbpn_id(gbpn_id)
+        if existing_handle is not None:
+            place = batch.get(existing_handle)
+            self.counters["places_reused"] += 1
+        elif sync:
+            timings["match"] += time.perf_counter() - started
+            return
+        else:
+            # A place of the same name tagged with another ID is another place
+            __, place = self.__ensure_place(
+                batch,
+                self.place_index,
+                name=place_name,
+                place_type=place_type,
+                untagged=True,
+            )
+        matched = time.perf_counter()
+        timings["match"] += matched - started
+        changes = []
+
+        # Set type
+        if place.get_type() is None or place.get_type() == PlaceType.UNKNOWN:
+            place.set_type(place_type)
+            changes.append("type")
+            LOG.debug(" - Set type: %s", place_type)
+
+        # Coordinates
+        if (
+            (sync or place.get_latitude() == "" or place.get_longitude() == "")
+            and latitude
+            and longitude
+            and (place.get_latitude(), place.get_longitude()) != (latitude, longitude)
+        ):
+            place.set_latitude(latitude)
+            place.set_longitude(longitude)
+            changes.append("coordinates")
+            LOG.debug(" - Set coordinates: %s, %s", latitude, longitude)
+
+        # GBPN URL
+        if gbpn_url:
+            description = self.GBPN_URL_DESCRIPTION % {"gbpn_id": gbpn_id}
+            add_url = True
+            for u in place.get_url_list():
+                if u.get_type() == GBPN_URL_TYPE and (
+                    u.get_path() == gbpn_url or u.get_description() == description
+                ):
+                    add_url = False
+                    break
+
+            if add_url:
+                url = self.__get_gbpn_url(gbpn_url, description)
+                place.add_url(url)
+                changes.append("url")
+                if self.plan is not None:
+                    self.plan.new_urls.append((place_name, gbpn_url))
+                LOG.debug(" - Added GBPN URL: %s", gbpn_url)
+
+        # Alternative names
+        if self._alternative_names_enabled:
+            existing_names = {n.get_value() for n in place.get_alternative_names()}
+            for alternative_name in [n for n in alternative_names.split(",") if n]:
+                if alternative_name not in existing_names:
+                    pn = PlaceName()
+                    pn.set_value(alternative_name)
+                    place.add_alternative_name(pn)
+                    existing_names.add(alternative_name)
+                    if self.plan is not None:
+                        self.plan.new_alternative_names.append(
+                            (place_name, alternative_name)
+                        )
+                    if "alternative_names" not in changes:
+                        changes.append("alternative_names")
+                    LOG.debug(
+                        " - Added alternative name: '%s' to place: '%s'",
+                        alternative_name,
+                        place_name,
+                    )
+                else:
+                    LOG.debug(
+                        " - Skipped existing alternative name: '%s'",
+                        alternative_name,
+                    )
+
+        updated = time.perf_counter()
+        timings["update"] += updated - matched
+
+        if self._hierarchy_enabled:
+            if self.__generate_hierarchy(batch, place, row):
+                changes.append("hierarchy")
+            timings["hierarchy"] += time.perf_counter() - updated
+
+        handle = place.get_handle()
+        if batch.is_new(handle):
+            self.place_index.add(handle, place)
+        elif changes:
+            batch.touch(place)
+            self.place_index.add(handle, place)
+            self.counters["places_changed"] += 1
+            self.changes[gbpn_id] = tuple(changes)
+            LOG.debug(" - Changed %s: %s", gbpn_id, ", ".join(changes))
+        else:
+            self.counters["places_unchanged"] += 1
+
+    # -------------------
+    # Helpers
+    # -------------------
+
+    @staticmethod
+    def __normalize_parish_name(name: str, strip_suffix: bool = True) -> str:
+        """Strip 'CP' from CivilParish names and trim whitespace."""
+        if strip_suffix and name.endswith(" CP"):
+            name = name[:-3]
+        return name
+
+    def __generate_hierarchy(
+        self, batch: PlaceBatch, place: Place, row: GazetteerRow
+    ) -> bool:
+        """
+        Build hierarchy with explicit PlaceTypes and time-scoped parents:
+
+          United Kingdom [COUNTRY]
+            -> Region [STATE]
+              -> Historic County [COUNTY] (before 1889-01-01) (there can be multiple)
+              -> Administrative County [COUNTY] (from 1889-01-01 to 1974-01-01)
+                  -> District [DISTRICT] (same admin period)
+              -> Unitary Authority [COUNTY] (after 1974-01-01)
+                  -> Parish [PARISH] (if CivilParish exists; also under the Administrative County path if applicable)
+
+        A parish on both paths is one place, enclosed by its District (or
+        Administrative County) and its Unitary Authority for their periods.
+
+        Returns whether the enclosing places of ``place`` changed.
+        """
+        # CSV fields
+        region = row.Region
+        historic_county_raw = row.HistCounty
+        ad_county = row.AdCounty
+        district = row.District
+        uni_auth = row.UniAuth
+        civil_parish_raw = row.CivilParish
+        civil_parish = (
+            self.__normalize_parish_name(
+                civil_parish_raw, self._strip_civil_parish_suffix
+            )
+            if civil_parish_raw
+            else ""
+        )
+
+        # 1) United Kingdom (COUNTRY)
+        uk_path, uk_handle = self.__ensure_hierarchy_place(
+            batch,
+            (),
+            name="United Kingdom",
+            place_type=PlaceType.COUNTRY,
+            parent_handle=None,
+        )
+
+        # 2) Region (STATE) under UK  (use PlaceType.REGION if available in your Gramps build)
+        region_path, region_handle = uk_path, uk_handle
+        if region:
+            region_path, region_handle = self.__ensure_hierarchy_place(
+                batch,
+                uk_path,
+                name=region,
+                place_type=PlaceType.COUNTRY,
+                parent_handle=uk_handle,
+            )
+
+        # 3) Historic County [COUNTY] under Region (supports multiple, slash-separated)
+        hist_parent_handles: list[str] = []
+        if self._hierarchy_historic and historic_county_raw:
+            parts = [p.strip() for p in historic_county_raw.split("/") if p.strip()]
+            # de-duplicate while preserving order
+            seen = set()
+            hist_names = [p for p in parts if not (p in seen or seen.add(p))]
+            for hist_name in hist_names:
+                _, h_handle = self.__ensure_hierarchy_place(
+                    batch,
+                    region_path,
+                    name=hist_name,
+                    place_type=PlaceType.COUNTY,
+                    parent_handle=region_handle,
+                )
+                hist_parent_handles.append(h_handle)
+
+        # 4) Admin County [COUNTY] and optional District [DISTRICT] under Region
+        admin_parent_handle = None
+        district_parent_handle = None
+        if self._hierarchy_admin and ad_county:
+            admin_path, admin_parent_handle = self.__ensure_hierarchy_place(
+                batch,
+                region_path,
+                name=ad_county,
+                place_type=PlaceType.COUNTY,
+                parent_handle=region_handle,
+            )
+            if district:
+                district_path, district_parent_handle = self.__ensure_hierarchy_place(
+                    batch,
+                    admin_path,
+                    name=district,
+                    place_type=PlaceType.DISTRICT,
+                    parent_handle=admin_parent_handle,
+                )
+
+        # 5) Unitary Authority [COUNTY] under Region
+        ua_parent_handle = None
+        if self._hierarchy_modern and uni_auth:
+            ua_path, ua_parent_handle = self.__ensure_hierarchy_place(
+                batch,
+                region_path,
+                name=uni_auth,
+                place_type=PlaceType.COUNTY,
+                parent_handle=region_handle,
+            )
+
+        # 6) Parish [PARISH] (if CivilParish exists)
+        #    - Under District if present (admin path), else under Admin County
+        #    - Under Unitary Authority for the modern path
+        parish_admin_handle = None
+        parish_modern_handle = None
+        if self._hierarchy_civil_parish and civil_parish:
+            # Admin path parish
+            if district_parent_handle:
+                _, parish_admin_handle = self.__ensure_hierarchy_place(
+                    batch,
+                    district_path,
+                    name=civil_parish,
+                    place_type=PlaceType.PARISH,
+                    parent_handle=district_parent_handle,
+                    period=self.ADMINISTRATIVE_COUNTIES_DATE_PERIOD,
+                )
+            elif admin_parent_handle:
+                _, parish_admin_handle = self.__ensure_hierarchy_place(
+                    batch,
+                    admin_path,
+                    name=civil_parish,
+                    place_type=PlaceType.PARISH,
+                    parent_handle=admin_parent_handle,
+                    period=self.ADMINISTRATIVE_COUNTIES_DATE_PERIOD,
+                )
+
+            # Modern path parish
+            if ua_parent_handle:
+                _, parish_modern_handle = self.__ensure_hierarchy_place(
+                    batch,
+                    ua_path,
+                    name=civil_parish,
+                    place_type=PlaceType.PARISH,
+                    parent_handle=ua_parent_handle,
+                    period=self.MODERN_REGIONS_DATE_PERIOD,
+                )
+
+        # 7) Build PlaceRefs for the current place with date ranges
+        new_refs: list[PlaceRef] = []
+
+        # Historic: attach one ref per historic county
+        if self._hierarchy_historic and hist_parent_handles:
+            for h in hist_parent_handles:
+                pr = PlaceRef()
+                pr.set_reference_handle(h)
+                pr.set_date_object(get_date_range(self.HISTORIC_COUNTIES_DATE_PERIOD))
+                new_refs.append(pr)
+
+        # Administrative (1889-01-01 to 1974-01-01): deepest parent available
+        admin_deepest = (
+            parish_admin_handle or district_parent_handle or admin_parent_handle
+        )
+        if self._hierarchy_admin and admin_deepest:
+            pr = PlaceRef()
+            pr.set_reference_handle(admin_deepest)
+            pr.set_date_object(get_date_range(self.ADMINISTRATIVE_COUNTIES_DATE_PERIOD))
+            new_refs.append(pr)
+
+        # Modern (after 1974-01-01): deepest parent available (prefer parish under UA)
+        modern_deepest = parish_modern_handle or ua_parent_handle
+        if self._hierarchy_modern and modern_deepest:
+            pr = PlaceRef()
+            pr.set_reference_handle(modern_deepest)
+            pr.set_date_object(get_date_range(self.MODERN_REGIONS_DATE_PERIOD))
+            new_refs.append(pr)
+
+        # Fallback: if nothing above, at least attach to Region (no date)
+        if not new_refs and region_handle and region_handle != uk_handle:
+            pr = PlaceRef()
+            pr.set_reference_handle(region_handle)
+            new_refs.append(pr)
+
+        # Apply new enclosing parents
+        existing_keys = self.__get_ref_keys(place.get_placeref_list())
+        if existing_keys == self.__get_ref_keys(new_refs):
+            return False
+        if self.plan is not None:
+            for ref in new_refs:
+                if not existing_keys[self.__get_ref_key(ref)]:
+                    self.__plan_place_ref(batch, place, ref)
+        place.set_placeref_list(new_refs)
+        return True
+
+    @staticmethod
+    def __get_ref_keys(refs: list[PlaceRef]) -> Counter:
+        """
+        Return the enclosing places and dates of PlaceRefs, ignoring their order.
+        """
+        return Counter(PlaceImporter.__get_ref_key(ref) for ref in refs)
+
+    @staticmethod
+    def __get_ref_key(ref: PlaceRef) -> tuple:
+        return ref.ref, ref.get_date_object().serialize(no_text_date=True)
+
+    def __plan_place_ref(self, batch: PlaceBatch, place: Place, ref: PlaceRef) -> None:
+        date = ref.get_date_object()
+        self.plan.new_place_refs.append(
+            (
+                place.get_name().get_value(),
+                batch.get(ref.ref).get_name().get_value(),
+                "" if date.is_empty() else str(date),
+            )
+        )
+
+    def __ensure_hierarchy_place(
+        self,
+        batch: PlaceBatch,
+        parent_path: HierarchyPath,
+        name: str,
+        place_type: int,
+        parent_handle: Optional[str],
+        period: Optional[str] = None,
+    ) -> tuple[HierarchyPath, str]:
+        """
+        Resolve a hierarchy place below ``parent_path``, once per import.
+
+        Rows of an import mostly share their chain of regions, counties and
+        parishes, so after the first row a level costs a dictionary lookup, and its
+        place is not loaded or committed again.
+        Returns (path, handle).
+        """
+        path = parent_path + ((name, place_type),)
+        handle = self._hierarchy_nodes.get(path)
+        if handle is not None:
+            self.counters["hierarchy_hits"] += 1
+        else:
+            handle, _ = self.__ensure_place(
+                batch,
+                self.place_index,
+                name=name,
+                place_type=place_type,
+                parent_handle=parent_handle,
+                period=period,
+            )
+            self._hierarchy_nodes[path] = handle
+        return path, handle
+
+    def __ensure_place(
+        self,
+        batch: PlaceBatch,
+        index: PlaceIndex,
+        name: str,
+        place_type: int | str,
+        parent_handle: Optional[str] = None,
+        untagged: bool = False,
+        period: Optional[str] = None,
+    ) -> tuple[str, Place]:
+        """
+        Get an existing place by (name, type) or create it, ensuring the parent chain exists.
+        Returns (handle, place).
+
+        With ``untagged`` set, only places without a GBPN ID are reused. With a
+        ``period`` (a date range such as ``"after 1974-01-01"``) the parent encloses
+        the place for that period only; an undated reference to the parent, as
+        earlier imports made, is given the date.
+        """
+        if untagged:
+            handle = index.find_untagged(name, place_type)
+        else:
+            handle = index.find(name, place_type)
+        if handle is not None:
+            self.counters["places_reused"] += 1
+            p = batch.get(handle)
+            # Ensure this place has the requested parent (without duplicating refs)
+            if parent_handle:
+                pr = self.__make_place_ref(parent_handle, period)
+                existing = [r for r in p.get_placeref_list() if r.ref == parent_handle]
+                undated = [r for r in existing if r.get_date_object().is_empty()]
+                if period is not None and undated and len(existing) == len(undated):
+                    undated[0].set_date_object(pr.get_date_object())
+                    batch.touch(p)
+                elif period is not None or not existing:
+                    key = self.__get_ref_key(pr)
+                    if not any(self.__get_ref_key(r) == key for r in existing):
+                        p.add_placeref(pr)
+                        batch.touch(p)
+                        if self.plan is not None:
+                            self.__plan_place_ref(batch, p, pr)
+            return handle, p
+
+        new_place = Place()
+        pn = PlaceName()
+        pn.set_value(name)
+        new_place.set_name(pn)
+        new_place.set_type(place_type)
+
+        if parent_handle:
+            pr = self.__make_place_ref(parent_handle, period)
+            new_place.add_placeref(pr)
+        handle = batch.add(new_place)
+        index.add(handle, new_place)
+        if self.plan is not None:
+            self.plan.new_places.append((name, str(new_place.get_type())))
+            if parent_handle:
+                self.__plan_place_ref(batch, new_place, pr)
+        self.counters["places_created"] += 1
+        return handle, new_place
+
+    @staticmethod
+    def __make_place_ref(parent_handle: str, period: Optional[str] = None) -> PlaceRef:
+        pr = PlaceRef()
+        pr.set_reference_handle(parent_handle)
+        if period is not None:
+            pr.set_date_object(get_date_range(period))
+        return pr
+
+    @staticmethod
+    def __get_gbpn_url(value: str, description: str) -> Url:
+        url = Url()
+        url.set_path(value)
+        url.set_type(GBPN_URL_TYPE)
+        url.set_description(description)
+        return url
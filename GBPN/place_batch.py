@@ -0,0 +1,89 @@
+"""
+Deferred, de-duplicated place commits within a single database transaction.
+"""
+
+from gramps.gen.db import DbTxn, DbWriteBase
+from gramps.gen.lib import Place
+from gramps.gen.utils.id import create_id
+
+
+class PlaceBatch:
+    """
+    Track the places changed within a transaction and commit each one once.
+
+    Places fetched through :meth:`get` or queued by :meth:`add` are shared for the
+    lifetime of the batch, so repeated changes to the same place (e.g. a county
+    gaining several parents) accumulate on one object and are written once by
+    :meth:`flush`.
+    """
+
+    def __init__(self, db: DbWriteBase, trans: DbTxn):
+        self.db = db
+        self.trans = trans
+        self._loaded: dict[str, Place] = {}
+        self._new: dict[str, Place] = {}
+        self._dirty: dict[str, Place] = {}
+
+    def get(self, handle: str) -> Place:
+        """
+        Return the place for a handle, preferring the copy held by this batch.
+        """
+        place = self._loaded.get(handle)
+        if place is None:
+            place = self.db.get_place_from_handle(handle)
+            self._loaded[handle] = place
+        return place
+
+    def add(self, place: Place) -> str:
+        """
+        Queue a new place for adding to the database and return its handle.
+
+        The handle is assigned straight away so other places can reference it, but
+        the place is only written once, by :meth:`flush`.
+        """
+        if not place.get_handle():
+            place.set_handle(create_id())
+        handle = place.get_handle()
+        self._loaded[handle] = place
+        self._new[handle] = place
+        return handle
+
+    def is_new(self, handle: str) -> bool:
+        """
+        Return whether the place was queued by :meth:`add` and not flushed yet.
+        """
+        return handle in self._new
+
+    def touch(self, place: Place) -> None:
+        """
+        Mark a place as changed so it is committed by :meth:`flush`.
+        """
+        handle = place.get_handle()
+        self._loaded[handle] = place
+        self._dirty[handle] = place
+
+    def flush(self) -> int:
+        """
+        Commit every changed place once and return the number of commits.
+        """
+        for handle, place in self._new.items():
+            self.db.add_place(place, self.trans)
+            self._dirty.pop(handle, None)
+        for place in self._dirty.values():
+            self.db.commit_place(place, self.trans)
+        count = len(self._new) + len(self._dirty)
+        self._new.clear()
+        self._dirty.clear()
+        return count
+
+    def discard(self) -> int:
+        """
+        Forget the changes without writing them and return the commits skipped.
+
+        The changed places stay available through :meth:`get`, so a dry run can
+        carry on planning against them.
+        """
+        count = len(self._new.keys() | self._dirty.keys())
+        self._new.clear()
+        self._dirty.clear()
+        return count
@@ -0,0 +1,416 @@
+"""
+Export of the places tagged with a GBPN ID and their enclosing places.
+"""
+
+import csv
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import IO, Iterator, NamedTuple, Optional
+
+from gramps.gen.db import DbReadBase
+from gramps.gen.lib import Place
+from gramps.gen.utils.place import conv_lat_lon
+
+from const import DOMAIN
+from date_ranges import get_date_range
+from importer import PlaceImporter
+from place_index import PlaceIndex
+from spatial import parse_coordinates
+
+LOG = logging.getLogger(DOMAIN)
+
+EXPORT_FORMATS = ("csv", "geojson")
+
+# Export formats by file name extension
+EXPORT_SUFFIXES = {".csv": "csv", ".geojson": "geojson", ".json": "geojson"}
+
+# Periods of the enclosing places, as dated by the importer's hierarchy; "other"
+# holds undated references and references dated by hand
+PERIODS = ("historic", "administrative", "modern", "other")
+
+# Between the places of an enclosing chain, from the outermost inwards, and
+# between the chains of a period in CSV output
+CHAIN_SEPARATOR = " > "
+CHAINS_SEPARATOR = " | "
+
+# Seconds spent writing places in each call of ExportJob.step
+EXPORT_STEP_TIME = 0.05
+
+CSV_COLUMNS = (
+    "GBPNID",
+    "GrampsID",
+    "Name",
+    "Type",
+    "Lat",
+    "Lng",
+    "Historic",
+    "Administrative",
+    "Modern",
+    "Other",
+)
+
+# Events counted by PlaceExporter
+EXPORT_COUNTERS = (
+    "places",  # places read from the tree
+    "exported",  # places with a GBPN ID
+    "deferred",  # written after the scan, as an enclosing place came later
+    "chain_hits",  # enclosing chains reused from the cache
+)
+
+
+class ExportedPlace(NamedTuple):
+    """
+    A place tagged with a GBPN ID and the places enclosing it in each period.
+    """
+
+    gbpn_ids: tuple[str, ...]
+    gramps_id: str
+    name: str
+    type: str
+    coordinates: Optional[tuple[float, float]]
+    # Chains of enclosing place names by period (see PERIODS), each from the
+    # outermost place (e.g. "United Kingdom") to the enclosing place
+    chains: dict[str, list[tuple[str, ...]]]
+
+
+def get_export_format(path: Path) -> str:
+    """
+    Return the export format implied by a file name (see :data:`EXPORT_SUFFIXES`),
+    CSV for any other file.
+    """
+    return EXPORT_SUFFIXES.get(path.suffix.lower(), "csv")
+
+
+class PlaceExporter:
+    """
+    Stream the places tagged with a GBPN ID, with their time-scoped enclosing
+    places, to CSV or GeoJSON.
+
+    The place table is read once, keeping the name and enclosing places of every
+    place, so no place is loaded twice. Each dated reference of a tagged place
+    gives the chain of enclosing places for its period, cached by handle and
+    period, so the counties and parishes shared by many places are resolved once.
+    Tagged places with an enclosing place further on in the table are written
+    once the table has been read. Like the import, this has to run where the
+    database may be read.
+    """
+
+    def __init__(self, db: DbReadBase):
+        self.db = db
+        self.counters: dict[str, int] = dict.fromkeys(EXPORT_COUNTERS, 0)
+        # Name and enclosing places with their periods, for the places read
+        self._places: dict[str, tuple[str, tuple[tuple[str, str], ...]]] = {}
+        self._chains: dict[tuple[str, str], tuple[str, ...]] = {}
+        self._periods: dict[tuple, str] = {}
+        # Set once the whole place table was read
+        self._read_all = False
+
+    def write(self, path: Path, export_format: Optional[str] = None) -> int:
+        """
+        Write the tagged places to a file, returning how many were written.
+
+        :param export_format: One of :data:`EXPORT_FORMATS`; by default it follows
+            the file name (see :func:`get_export_format`).
+        """
+        for _ in self.iter_write(path, export_format):
+            pass
+        return self.counters["exported"]
+
+    def iter_write(
+        self, path: Path, export_format: Optional[str] = None
+    ) -> Iterator[ExportedPlace]:
+        """
+        Write the tagged places to a file as :meth:`write` does, yielding each
+        place once written, so the export can be spread over several calls.
+
+        Closing the iterator early leaves a partial file.
+        """
+        export_format = export_format or get_export_format(path)
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {export_format}")
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            if export_format == "geojson":
+                yield from self.__iter_geojson(file)
+            else:
+                yield from self.__iter_csv(file)
+        LOG.info(
+            "Exported %d place(s) to %s, %d after reading the place table",
+            self.counters["exported"],
+            path,
+            self.counters["deferred"],
+        )
+
+    def __iter_csv(self, file: IO[str]) -> Iterator[ExportedPlace]:
+        """
+        Write one CSV row per tagged place, with its chains by period.
+        """
+        writer = csv.writer(file)
+        writer.writerow(CSV_COLUMNS)
+        for place in self.iter_places():
+            latitude, longitude = place.coordinates or ("", "")
+            writer.writerow(
+                (
+                    " ".join(place.gbpn_ids),
+                    place.gramps_id,
+                    place.name,
+                    place.type,
+                    latitude,
+                    longitude,
+                    *(
+                        CHAINS_SEPARATOR.join(
+                            CHAIN_SEPARATOR.join(chain)
+                            for chain in place.chains[period]
+                        )
+                        for period in PERIODS
+                    ),
+                )
+            )
+            yield place
+
+    def __iter_geojson(self, file: IO[str]) -> Iterator[ExportedPlace]:
+        """
+        Write a GeoJSON feature collection, one point per tagged place.
+
+        Places without coordinates have no geometry. Features are written as they
+        are read, so the collection is never held in memory.
+        """
+        file.write('{"type": "FeatureCollection", "features": [')
+        separator = "\n"
+        for place in self.iter_places():
+            feature = {
+                "type": "Feature",
+                "geometry": (
+                    {
+                        "type": "Point",
+                        "coordinates": [place.coordinates[1], place.coordinates[0]],
+                    }
+                    if place.coordinates is not None
+                    else None
+                ),
+                "properties": {
+                    "gbpn_ids": list(place.gbpn_ids),
+                    "gramps_id": place.gramps_id,
+                    "name": place.name,
+                    "type": place.type,
+                    **{
+                        period: [list(chain) for chain in place.chains[period]]
+                        for period in PERIODS
+                    },
+                },
+            }
+            file.write(separator + json.dumps(feature, ensure_ascii=False))
+            separator = ",\n"
+            yield place
+        file.write("\n]}\n")
+
+    def iter_places(self) -> Iterator[ExportedPlace]:
+        """
+        Yield the places with a GBPN ID, in the order of the place table, except
+        that places with an enclosing place further on come after the others.
+        """
+        counters = self.counters
+        deferred = []
+        for place in self.db.iter_places():
+            counters["places"] += 1
+            place_data = self.__get_place_data(place)
+            self._places[place.get_handle()] = place_data
+            gbpn_ids = PlaceIndex.get_gbpn_ids(place)
+            if not gbpn_ids:
+                continue
+            counters["exported"] += 1
+            exported = self.__get_exported_place(place, gbpn_ids)
+            chains = self.__get_chains(place_data[1])
+            if chains is None:
+                counters["deferred"] += 1
+                deferred.append((exported, place_data[1]))
+                continue
+            yield exported._replace(chains=chains)
+
+        self._read_all = True
+        for exported, refs in deferred:
+            yield exported._replace(chains=self.__get_chains(refs))
+
+    @staticmethod
+    def __get_exported_place(place: Place, gbpn_ids: set[str]) -> ExportedPlace:
+        """
+        Return a tagged place, without its chains of enclosing places.
+        """
+        latitude, longitude = conv_lat_lon(
+            place.get_latitude(), place.get_longitude(), "D.D8"
+        )
+        return ExportedPlace(
+            gbpn_ids=tuple(sorted(gbpn_ids, key=lambda i: (len(i), i))),
+            gramps_id=place.get_gramps_id(),
+            name=place.get_name().get_value(),
+            type=str(place.get_type()),
+            coordinates=(
+                parse_coordinates(latitude, longitude) if latitude is not None else None
+            ),
+            chains={},
+        )
+
+    def __get_chains(
+        self, refs: tuple[tuple[str, str], ...]
+    ) -> Optional[dict[str, list[tuple[str, ...]]]]:
+        """
+        Return the chains of enclosing places by period for a place's references,
+        or None if one of them leads to a place that has not been read yet.
+        """
+        chains: dict[str, list[tuple[str, ...]]] = {period: [] for period in PERIODS}
+        for handle, period in refs:
+            chain = self.__get_chain(handle, period)
+            if chain is None:
+                return None
+            chains[period].append(chain)
+        return chains
+
+    def __get_period(self, date) -> str:
+        if not self._periods:
+            for period, text in (
+                ("historic", PlaceImporter.HISTORIC_COUNTIES_DATE_PERIOD),
+                ("administrative", PlaceImporter.ADMINISTRATIVE_COUNTIES_DATE_PERIOD),
+                ("modern", PlaceImporter.MODERN_REGIONS_DATE_PERIOD),
+            ):
+                self._periods[get_date_range(text).serialize(no_text_date=True)] = (
+                    period
+                )
+        return self._periods.get(date.serialize(no_text_date=True), "other")
+
+    def __get_chain(self, handle: str, period: str) -> Optional[tuple[str, ...]]:
+        """
+        Return the names from the outermost place enclosing ``handle`` down to it,
+        or None if the chain leads to a place that has not been read yet.
+
+        Much as Gramps builds place titles, each place is followed up through its
+        enclosing place for the period, or else its first one.
+        """
+        chain = self._chains.get((handle, period))
+        if chain is not None:
+            self.counters["chain_hits"] += 1
+            return chain
+
+        # Iterative, since enclosing chains may be deep or (wrongly) circular
+        pending = []
+        seen = set()
+        current = handle
+        while current is not None and (current, period) not in self._chains:
+            if current in seen:
+                break
+            place_data = self._places.get(current)
+            if place_data is None:
+                if not self._read_all:
+                    return None
+                LOG.warning("Enclosing place %s not found", current)
+                place_data = self._places[current] = ("", ())
+            seen.add(current)
+            pending.append(current)
+            current = self.__get_parent(place_data[1], period)
+        if current is None or current in seen:
+            chain = ()
+        else:
+            chain = self._chains[(current, period)]
+        for current in reversed(pending):
+            chain = chain + (self._places[current][0],)
+            self._chains[(current, period)] = chain
+        return chain
+
+    @staticmethod
+    def __get_parent(refs: tuple[tuple[str, str], ...], period: str) -> Optional[str]:
+        for parent, parent_period in refs:
+            if parent_period == period:
+                return parent
+        return refs[0][0] if refs else None
+
+    def __get_place_data(self, place: Place) -> tuple[str, tuple[tuple[str, str], ...]]:
+        """
+        Return the name and enclosing places, with their periods, of a place.
+        """
+        return (
+            place.get_name().get_value(),
+            tuple(
+                (ref.ref, self.__get_period(ref.get_date_object()))
+                for ref in place.get_placeref_list()
+            ),
+        )
+
+
+class ExportJob:
+    """
+    Write an export from the GTK main loop, a few places at a time.
+
+    Gramps databases are not thread safe, so rather than on a worker thread the
+    export runs in calls to :meth:`step`, each writing places for about
+    :data:`EXPORT_STEP_TIME` seconds. Places are written to a temporary file next
+    to ``path``, which replaces it once the export is finished, so a cancelled or
+    failed export leaves any existing file as it was. Progress and cancelling work
+    as for an :class:`import_job.ImportJob`.
+    """
+
+    def __init__(
+        self, exporter: PlaceExporter, path: Path, export_format: Optional[str] = None
+    ):
+        self.exporter = exporter
+        self.path = path
+        self.total = exporter.db.get_number_of_places()
+        self.error: Optional[BaseException] = None
+        # Places written so far
+        self.count = 0
+
+        self._tmp_path = path.with_name(path.name + ".tmp")
+        self._places = exporter.iter_write(
+            self._tmp_path, export_format or get_export_format(path)
+        )
+        self._cancelled = False
+        self._done = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    def get_fraction(self) -> float:
+        """
+        Return the share of the place table read, between 0 and 1.
+        """
+        if self._done or not self.total:
+            return 1.0
+        return min(self.exporter.counters["places"] / self.total, 1.0)
+
+    def step(self) -> bool:
+        """
+        Write places for a while, returning whether any are left.
+
+        Errors are kept in :attr:`error` rather than raised, ending the export.
+        """
+        if self._done:
+            return False
+        deadline = time.perf_counter() + EXPORT_STEP_TIME
+        try:
+            while not self._cancelled:
+                if next(self._places, None) is None:
+                    os.replace(self._tmp_path, self.path)
+                    self._done = True
+                    return False
+                self.count += 1
+                if time.perf_counter() >= deadline:
+                    return True
+        except Exception as err:  # reported to the user by the caller
+            LOG.exception("Exporting GBPN places failed")
+            self.error = err
+
+        self._places.close()
+        self._done = True
+        try:
+            self._tmp_path.unlink(missing_ok=True)
+        except OSError as err:
+            LOG.warning("Unable to remove %s: %s", self._tmp_path, err)
+        return False
@@ -0,0 +1,205 @@
+"""
+In-memory indexes over the places in a Gramps database.
+"""
+
+import logging
+import re
+from typing import Optional
+
+from gramps.gen.db import DbReadBase
+from gramps.gen.lib import Place, PlaceType
+
+from const import DOMAIN, GBPN_URL_TYPE
+
+LOG = logging.getLogger(DOMAIN)
+
+# The trailing number of a GBPN URL description ("... (ID: 1234)") or path.
+_GBPN_ID_PATTERN = re.compile(r"(\d+)\D*$")
+
+NameTypeKey = tuple[str, int, str]
+
+
+class PlaceIndex:
+    """
+    Look up places by (normalised name, PlaceType) and by GBPN ID.
+
+    The index is built from a single pass over the place table on first use. It
+    is kept current by :meth:`add` for places created during an import, and by
+    :meth:`update` and :meth:`remove`, which match the signatures of the
+    ``place-add``/``place-update``/``place-delete`` database signals.
+    """
+
+    def __init__(self, db: DbReadBase):
+        self._db = db
+        self._built = False
+        # Places read from the database by index builds, for instrumentation
+        self.scanned = 0
+        self._by_name_type: dict[NameTypeKey, list[str]] = {}
+        self._by_gbpn_id: dict[str, list[str]] = {}
+        # Reverse maps so updates and deletes can drop stale entries
+        self._name_type_keys: dict[str, NameTypeKey] = {}
+        self._gbpn_ids: dict[str, set[str]] = {}
+
+    def find(self, name: str, place_type: int | str | PlaceType) -> Optional[str]:
+        """
+        Return the handle of the first place with the given name and type, if any.
+        """
+        self.__ensure_built()
+        return self.__first(self._by_name_type, self.__key(name, place_type))
+
+    def find_untagged(
+        self, name: str, place_type: int | str | PlaceType
+    ) -> Optional[str]:
+        """
+        Return the handle of the first place with the given name and type and no
+        GBPN ID, if any.
+        """
+        self.__ensure_built()
+        for handle in self._by_name_type.get(self.__key(name, place_type), ()):
+            if handle not in self._gbpn_ids:
+                return handle
+        return None
+
+    def find_by_gbpn_id(self, gbpn_id: str) -> Optional[str]:
+        """
+        Return the handle of the first place carrying a GBPN URL for the ID, if any.
+        """
+        self.__ensure_built()
+        return self.__first(self._by_gbpn_id, gbpn_id)
+
+    def get_indexed_gbpn_ids(self) -> set[str]:
+        """
+        Return the GBPN IDs of all places carrying a GBPN URL.
+        """
+        self.__ensure_built()
+        return set(self._by_gbpn_id)
+
+    def add(self, handle: str, place: Place) -> None:
+        """
+        Record a place that was added to the database after the index was built.
+        """
+        if self._built:
+            self.__discard(handle)
+            self.__insert(handle, place)
+
+    def update(self, handles: list[str]) -> None:
+        """
+        Refresh the entries for places that were added or changed.
+        """
+        if not self._built:
+            return
+        for handle in handles:
+            self.__discard(handle)
+            place = self._db.get_place_from_handle(handle)
+            if place is not None:
+                self.__insert(handle, place)
+
+    def remove(self, handles: list[str]) -> None:
+        """
+        Drop the entries for places that were deleted.
+        """
+        if not self._built:
+            return
+        for handle in handles:
+            self.__discard(handle)
+
+    def copy(self) -> "PlaceIndex":
+        """
+        Return an independent copy, e.g. to plan changes without altering this one.
+        """
+        self.__ensure_built()
+        other = PlaceIndex(self._db)
+        other._built = True
+        for mapping, other_mapping in (
+            (self._by_name_type, other._by_name_type),
+            (self._by_gbpn_id, other._by_gbpn_id),
+        ):
+            for key, handles in mapping.items():
+                other_mapping[key] = list(handles)
+        other._name_type_keys.update(self._name_type_keys)
+        for handle, gbpn_ids in self._gbpn_ids.items():
+            other._gbpn_ids[handle] = set(gbpn_ids)
+        return other
+
+    def reset(self) -> None:
+        """
+        Forget everything; the index is rebuilt on the next lookup.
+        """
+        self._built = False
+        self._by_name_type.clear()
+        self._by_gbpn_id.clear()
+        self._name_type_keys.clear()
+        self._gbpn_ids.clear()
+
+    @staticmethod
+    def get_gbpn_ids(place: Place) -> set[str]:
+        """
+        Return the GBPN IDs referenced by the GBPN URLs of a place.
+        """
+        ids = set()
+        for url in place.get_url_list():
+            if url.get_type() != GBPN_URL_TYPE:
+                continue
+            for text in (url.get_description(), url.get_path()):
+                match = _GBPN_ID_PATTERN.search(text or "")
+                if match:
+                    ids.add(match.group(1))
+                    break
+        return ids
+
+    # -------------------
+    # Helpers
+    # -------------------
+
+    def __ensure_built(self) -> None:
+        if self._built:
+            return
+        for place in self._db.iter_places():
+            self.__insert(place.get_handle(), place)
+            self.scanned += 1
+        self._built = True
+        LOG.debug(
+            "Indexed %d places (%d with a GBPN ID)",
+            len(self._name_type_keys),
+            len(self._gbpn_ids),
+        )
+
+    def __insert(self, handle: str, place: Place) -> None:
+        if place.get_name():
+            key = self.__key(place.get_name().get_value(), place.get_type())
+            self._by_name_type.setdefault(key, []).append(handle)
+            self._name_type_keys[handle] = key
+
+        gbpn_ids = self.get_gbpn_ids(place)
+        for gbpn_id in gbpn_ids:
+            self._by_gbpn_id.setdefault(gbpn_id, []).append(handle)
+        if gbpn_ids:
+            self._gbpn_ids[handle] = gbpn_ids
+
+    def __discard(self, handle: str) -> None:
+        key = self._name_type_keys.pop(handle, None)
+        if key is not None:
+            self.__unlink(self._by_name_type, key, handle)
+        for gbpn_id in self._gbpn_ids.pop(handle, ()):
+            self.__unlink(self._by_gbpn_id, gbpn_id, handle)
+
+    @staticmethod
+    def __unlink(mapping: dict, key, handle: str) -> None:
+        handles = mapping.get(key)
+        if handles and handle in handles:
+            handles.remove(handle)
+            if not handles:
+                del mapping[key]
+
+    @staticmethod
+    def __first(mapping: dict, key) -> Optional[str]:
+        handles = mapping.get(key)
+        return handles[0] if handles else None
+
+    @staticmethod
+    def __key(name: str, place_type: int | str | PlaceType) -> NameTypeKey:
+        if not isinstance(place_type, PlaceType):
+            place_type = PlaceType(place_type)
+        value = place_type.value
+        custom = place_type.string if value == PlaceType.CUSTOM else ""
+        return name.strip(), value, custom
@@ -0,0 +1,338 @@
+"""
+Matching of Gramps places without a GBPN ID to gazetteer places.
+"""
+
+import logging
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+
+from gramps.gen.db import DbReadBase
+from gramps.gen.lib import PlaceType
+from gramps.gen.utils.place import conv_lat_lon
+
+from const import DOMAIN
+from csv_ranges import normalize_name
+from gazetteer import Gazetteer, GazetteerRow
+from place_index import PlaceIndex
+from spatial import get_distance, parse_coordinates
+
+LOG = logging.getLogger(DOMAIN)
+
+# Places whose names are looked up in the gazetteer together
+MATCH_CHUNK_SIZE = 500
+
+# Score a candidate needs to be matched, between 0 and 1
+MATCH_THRESHOLD = 0.7
+
+# Lead a match needs over the next best candidate, so ambiguous names are skipped
+MATCH_MARGIN = 0.1
+
+# Candidates further from a place with coordinates are rejected, in kilometres
+MATCH_DISTANCE = 10.0
+
+# Gazetteer places near a place with coordinates that are scored
+NEAREST_CANDIDATES = 10
+
+# Parts of the score. A name or alternative name and its county, or a name and a
+# position within a couple of kilometres, are enough for a match; neither is on
+# its own.
+NAME_WEIGHT = 0.5
+ALTERNATIVE_NAME_WEIGHT = 0.45
+COUNTY_WEIGHT = 0.25
+DISTANCE_WEIGHT = 0.25
+
+# Places of these types are the hierarchy rather than gazetteer places
+SKIPPED_TYPES = frozenset(
+    (
+        PlaceType.COUNTRY,
+        PlaceType.STATE,
+        PlaceType.COUNTY,
+        PlaceType.DISTRICT,
+        PlaceType.PARISH,
+    )
+)
+
+# Events counted by PlaceMatcher
+MATCH_COUNTERS = (
+    "places",  # untagged places checked
+    "matched",
+    "ambiguous",  # more than one candidate scored about as well
+    "unmatched",  # no candidate scored well enough
+)
+
+
+class UntaggedPlace(NamedTuple):
+    """
+    A Gramps place without a GBPN ID, as needed to match it.
+    """
+
+    handle: str
+    title: str
+    # Normalised name and alternative names
+    names: frozenset[str]
+    # Normalised names of the enclosing places, and of any parts of the name
+    # after a comma (e.g. "Little Snoring, Norfolk")
+    context: frozenset[str]
+    coordinates: Optional[tuple[float, float]]
+
+
+class PlaceMatch(NamedTuple):
+    """
+    An untagged place and the gazetteer place it was matched to.
+    """
+
+    place: UntaggedPlace
+    row: GazetteerRow
+    score: float
+    # In kilometres, if both have coordinates
+    distance: Optional[float]
+
+    def as_dict(self) -> dict:
+        """
+        Return the match as plain values, e.g. for JSON output.
+        """
+        return {
+            "handle": self.place.handle,
+            "place": self.place.title,
+            "gbpn_id": self.row.GBPNID,
+            "gbpn_name": self.row.PlaceName,
+            "score": round(self.score, 3),
+            "distance": None if self.distance is None else round(self.distance, 2),
+        }
+
+
+def collect_untagged_places(db: DbReadBase) -> list[UntaggedPlace]:
+    """
+    Return the places without a GBPN URL that could be gazetteer places.
+
+    Places of :data:`SKIPPED_TYPES` and places without a name are left out. The
+    place table is read once, so this has to run where the database may be read.
+    """
+    names: dict[str, str] = {}
+    parents: dict[str, list[str]] = {}
+    untagged = []
+    for place in db.iter_places():
+        handle = place.get_handle()
+        name = place.get_name().get_value() if place.get_name() else ""
+        names[handle] = name
+        parents[handle] = [ref.ref for ref in place.get_placeref_list()]
+        if (
+            not name.strip()
+            or place.get_type().value in SKIPPED_TYPES
+            or PlaceIndex.get_gbpn_ids(place)
+        ):
+            continue
+        untagged.append(
+            (
+                place,
+                frozenset(
+                    alternative.get_value()
+                    for alternative in place.get_alternative_names()
+                ),
+            )
+        )
+
+    ancestors: dict[str, frozenset[str]] = {}
+
+    def get_ancestors(handle: str) -> frozenset[str]:
+        # Iterative, since enclosing chains may be deep or (wrongly) circular
+        pending = [handle]
+        seen = {handle}
+        found = set()
+        while pending:
+            current = pending.pop()
+            for parent in parents.get(current, ()):
+                if parent in seen:
+                    continue
+                seen.add(parent)
+                if parent in ancestors:
+                    found.add(parent)
+                    found.update(ancestors[parent])
+                else:
+                    found.add(parent)
+                    pending.append(parent)
+        ancestors[handle] = frozenset(found)
+        return ancestors[handle]
+
+    places = []
+    for place, alternative_names in untagged:
+        handle = place.get_handle()
+        title, *context = names[handle].split(",")
+        context += [names.get(parent, "") for parent in get_ancestors(handle)]
+        latitude, longitude = conv_lat_lon(
+            place.get_latitude(), place.get_longitude(), "D.D8"
+        )
+        places.append(
+            UntaggedPlace(
+                handle=handle,
+                title=names[handle],
+                names=frozenset(
+                    key
+                    for key in map(normalize_name, (title, *alternative_names))
+                    if key
+                ),
+                context=frozenset(key for key in map(normalize_name, context) if key),
+                coordinates=(
+                    parse_coordinates(latitude, longitude)
+                    if latitude is not None
+                    else None
+                ),
+            )
+        )
+    return places
+
+
+class PlaceMatcher:
+    """
+    Find the gazetteer place each untagged Gramps place most likely is.
+
+    Candidates come from the gazetteer's indexes: places carrying one of the
+    place's names, looked up for :data:`MATCH_CHUNK_SIZE` places at a time, and
+    the :data:`NEAREST_CANDIDATES` places nearest to it. Each is scored on its
+    name, its counties, districts and parishes against the enclosing places, and
+    its distance. The best candidate is matched if it scores at least
+    ``threshold`` and :data:`MATCH_MARGIN` more than the next best.
+
+    Gazetteer places already tagged in the tree, or matched earlier, are not
+    matched again, so each GBPN ID ends up on one place. The matcher only reads
+    the gazetteer, so it may run on a worker thread.
+    """
+
+    def __init__(
+        self,
+        gazetteer: Gazetteer,
+        tagged_ids: Iterable[str] = (),
+        threshold: float = MATCH_THRESHOLD,
+        max_distance: float = MATCH_DISTANCE,
+    ):
+        self.gazetteer = gazetteer
+        self.threshold = threshold
+        self.max_distance = max_distance
+        self.counters: dict[str, int] = dict.fromkeys(MATCH_COUNTERS, 0)
+        self.matches: list[PlaceMatch] = []
+        self._taken_ids = set(tagged_ids)
+
+    def iter_matches(
+        self,
+        places: list[UntaggedPlace],
+        progress: Optional[Callable[[float], None]] = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ) -> Iterator[PlaceMatch]:
+        """
+        Yield the confident matches for the places, which are also kept in
+        :attr:`matches`.
+
+        :param progress: Called after each chunk with the fraction of places done.
+        :param cancelled: Checked between chunks; matching stops once it is true.
+        """
+        for start in range(0, len(places), MATCH_CHUNK_SIZE):
+            if cancelled is not None and cancelled():
+                return
+            chunk = places[start : start + MATCH_CHUNK_SIZE]
+            rows_by_name = self.gazetteer.find_names(
+                name for place in chunk for name in place.names
+            )
+            for place in chunk:
+                match = self.__match(place, rows_by_name)
+                if match is not None:
+                    yield match
+            if progress is not None:
+                progress(min(start + MATCH_CHUNK_SIZE, len(places)) / len(places))
+
+    def __match(
+        self, place: UntaggedPlace, rows_by_name: dict[str, list[GazetteerRow]]
+    ) -> Optional[PlaceMatch]:
+        counters = self.counters
+        counters["places"] += 1
+
+        # Rows by GBPN ID, and whether they carry one of the place's names
+        candidates: dict[str, tuple[GazetteerRow, bool]] = {}
+        if place.coordinates is not None:
+            for _, row in self.gazetteer.find_nearest(
+                *place.coordinates, NEAREST_CANDIDATES, self.max_distance
+            ):
+                candidates[row.GBPNID] = (row, False)
+        for name in place.names:
+            for row in rows_by_name.get(name, ()):
+                candidates[row.GBPNID] = (row, True)
+
+        scored = []
+        for gbpn_id, (row, named) in candidates.items():
+            if gbpn_id in self._taken_ids:
+                continue
+            match = self.__score(place, row, named)
+            if match is not None:
+                scored.append(match)
+        scored.sort(key=lambda match: match.score, reverse=True)
+        if not scored or scored[0].score < self.threshold:
+            counters["unmatched"] += 1
+            return None
+        best = scored[0]
+        if len(scored) > 1 and best.score - scored[1].score < MATCH_MARGIN:
+            counters["ambiguous"] += 1
+            LOG.debug(
+                "Ambiguous match for %s: GBPN %s or %s",
+                place.title,
+                best.row.GBPNID,
+                scored[1].row.GBPNID,
+            )
+            return None
+
+        counters["matched"] += 1
+        self._taken_ids.add(best.row.GBPNID)
+        self.matches.append(best)
+        LOG.info(
+            "Matched %s to GBPN %s (%s), score %.2f",
+            place.title,
+            best.row.GBPNID,
+            best.row.PlaceName,
+            best.score,
+        )
+        return best
+
+    def __score(
+        self, place: UntaggedPlace, row: GazetteerRow, named: bool
+    ) -> Optional[PlaceMatch]:
+        """
+        Score a candidate row for a place, or return None if it is too far away.
+
+        :param named: Whether the place's names include one of the row's names or
+            alternative names, which may be listed on rows of their own.
+        """
+        score = 0.0
+        if normalize_name(row.PlaceName) in place.names:
+            score += NAME_WEIGHT
+        elif named:
+            score += ALTERNATIVE_NAME_WEIGHT
+
+        if place.context and not place.context.isdisjoint(get_row_context(row)):
+            score += COUNTY_WEIGHT
+
+        distance = None
+        coordinates = parse_coordinates(row.Lat, row.Lng)
+        if place.coordinates is not None and coordinates is not None:
+            distance = get_distance(*place.coordinates, *coordinates)
+            if distance > self.max_distance:
+                return None
+            score += DISTANCE_WEIGHT * (1 - distance / self.max_distance)
+        return PlaceMatch(place, row, score, distance)
+
+
+def get_row_context(row: GazetteerRow) -> set[str]:
+    """
+    Return the normalised names of the counties, districts and parishes enclosing
+    a gazetteer place.
+
+    Civil parishes are included with and without their " CP" suffix. The region is
+    left out: it is a country (England, Scotland...), shared by most places of the
+    same name, so it would count as a county for all of them.
+    """
+    names = [
+        *row.HistCounty.split("/"),
+        row.AdCounty,
+        row.District,
+        row.UniAuth,
+        row.CivilParish,
+    ]
+    if row.CivilParish.endswith(" CP"):
+        names.append(row.CivilParish[:-3])
+    return {key for key in map(normalize_name, names) if key}
@@ -0,0 +1,52 @@
+"""
+Preferences of the GBPN addon, shared by the gramplet and the command line tool.
+"""
+
+import functools
+import tempfile
+from pathlib import Path
+
+from gramps.gen.config import config
+
+from const import (
+    INI_PREFERENCES_ALTERNATIVE_NAMES_ENABLED,
+    INI_PREFERENCES_HIERARCHY_ENABLED,
+    INI_HIERARCHY_ADMIN,
+    INI_HIERARCHY_HISTORIC,
+    INI_HIERARCHY_MODERN,
+    INI_HIERARCHY_CIVIL_PARISH,
+    INI_PREFERENCES_STRIP_CIVIL_PARISH_SUFFIX,
+    INI_PREFERENCES_TRANSACTION_SIZE,
+    INI_PREFERENCES_PROFILE,
+    DOMAIN,
+)
+
+# Configuration
+CONFIG = config.register_manager(DOMAIN)
+CONFIG.register(INI_PREFERENCES_ALTERNATIVE_NAMES_ENABLED, True)
+CONFIG.register(INI_PREFERENCES_HIERARCHY_ENABLED, True)
+CONFIG.register(INI_PREFERENCES_STRIP_CIVIL_PARISH_SUFFIX, False)
+CONFIG.register(INI_PREFERENCES_TRANSACTION_SIZE, 0)
+CONFIG.register(INI_PREFERENCES_PROFILE, False)
+CONFIG.register(INI_HIERARCHY_ADMIN, True)
+CONFIG.register(INI_HIERARCHY_CIVIL_PARISH, True)
+CONFIG.register(INI_HIERARCHY_HISTORIC, True)
+CONFIG.register(INI_HIERARCHY_MODERN, True)
+
+
+@functools.cache
+def get_config():
+    """
+    Return the preferences, reading ``gbpn.ini`` the first time they are needed.
+    """
+    CONFIG.load()
+    return CONFIG
+
+
+def get_profile_path() -> Path:
+    """
+    Return where import profiles are written: ``gbpn.prof`` next to ``gbpn.ini``.
+    """
+    if CONFIG.filename:
+        return Path(CONFIG.filename).with_suffix(".prof")
+    return Path(tempfile.gettempdir()) / f"{DOMAIN}.prof"
@@ -0,0 +1,80 @@
+"""
+A grid over latitude and longitude, for finding gazetteer places by position.
+
+Cells are numbered band by band from the south west, so the cells of a box within
+one band of latitude form a contiguous range. Workers parsing ``GBPN.csv`` import
+this module by name, so it only depends on the standard library.
+"""
+
+import math
+from typing import Optional
+
+# Height and width of a grid cell in degrees; about 2 km north to south
+GRID_CELL_SIZE = 0.02
+
+# Cells in each band of latitude
+_COLUMNS = math.ceil(360 / GRID_CELL_SIZE)
+
+# Mean radius of the earth
+EARTH_RADIUS_KM = 6371.0088
+
+# Distance covered by a degree of latitude
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def parse_coordinates(latitude: str, longitude: str) -> Optional[tuple[float, float]]:
+    """
+    Return the latitude and longitude in decimal degrees, or None if either is
+    missing or out of range.
+    """
+    try:
+        lat = float(latitude)
+        lng = float(longitude)
+    except ValueError:
+        return None
+    # Also rejects NaN
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+        return None
+    return lat, lng
+
+
+def get_cell(lat: float, lng: float) -> int:
+    """
+    Return the grid cell holding a position.
+    """
+    return _get_band(lat) * _COLUMNS + _get_column(lng)
+
+
+def get_cell_ranges(
+    south: float, west: float, north: float, east: float
+) -> list[tuple[int, int]]:
+    """
+    Return the cells covering a box as (first, last) ranges, one per band.
+    """
+    first = _get_column(west)
+    last = _get_column(east)
+    return [
+        (band * _COLUMNS + first, band * _COLUMNS + last)
+        for band in range(_get_band(south), _get_band(north) + 1)
+    ]
+
+
+def get_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """
+    Return the great-circle distance between two positions in kilometres.
+    """
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    sine = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(sine)))
+
+
+def _get_band(lat: float) -> int:
+    return int((lat + 90.0) / GRID_CELL_SIZE)
+
+
+def _get_column(lng: float) -> int:
+    # 180 degrees east would otherwise spill into the next band
+    return min(int((lng + 180.0) / GRID_CELL_SIZE), _COLUMNS - 1)
@@ -0,0 +1,134 @@
+"""
+Tests for importing gazetteer rows into a Gramps database.
+
+Run from the repository root with Gramps importable:
+
+    python -m pytest GBPN/tests
+"""
+
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gramps.gen.db import DbTxn  # noqa: E402
+from gramps.gen.db.utils import make_database  # noqa: E402
+from gramps.gen.lib import Place, PlaceName, PlaceType  # noqa: E402
+
+from gazetteer import GazetteerRow  # noqa: E402
+from importer import PlaceImporter  # noqa: E402
+from place_index import PlaceIndex  # noqa: E402
+
+
+def make_row(
+    gbpn_id: str, name: str, county: str, district: str, lat: str, lng: str
+) -> GazetteerRow:
+    return GazetteerRow(
+        GBPNID=gbpn_id,
+        PlaceName=name,
+        GBPN_URL=f"https://gbnames.example/place/{gbpn_id}",
+        Region="England",
+        HistCounty=county,
+        AdCounty=county,
+        District=district,
+        UniAuth="",
+        CivilParish="",
+        Alternative_Name="",
+        Type="Village",
+        NameType="P",
+        Lat=lat,
+        Lng=lng,
+    )
+
+
+NEWTONS = [
+    make_row("1", "Newton", "Yorkshire", "Ryedale", "54.27", "-0.80"),
+    make_row("2", "Newton", "Cheshire", "Cheshire West", "53.21", "-2.88"),
+    make_row("3", "Newton", "Norfolk", "Breckland", "52.70", "0.69"),
+]
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """
+    A test with an empty SQLite Gramps database in :attr:`db`.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="gbpn-test-")
+        self.db = make_database("sqlite")
+        self.db.load(self.directory)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def get_places(self, name: str) -> list[Place]:
+        return [
+            place
+            for place in self.db.iter_places()
+            if place.get_name().get_value() == name
+        ]
+
+
+class PlaceImporterTest(DatabaseTestCase):
+    def test_duplicate_names_are_separate_places(self):
+        PlaceImporter(self.db).run(NEWTONS, 0)
+        places = self.get_places("Newton")
+        self.assertEqual(
+            sorted(PlaceIndex.get_gbpn_ids(place).pop() for place in places),
+            ["1", "2", "3"],
+        )
+        for place in places:
+            self.assertEqual(len(PlaceIndex.get_gbpn_ids(place)), 1)
+
+    def test_duplicate_names_in_separate_chunks(self):
+        importer = PlaceImporter(self.db)
+        importer.run(NEWTONS, 1)
+        importer.run(NEWTONS, 1)
+        self.assertEqual(len(self.get_places("Newton")), 3)
+
+    def test_untagged_place_of_the_same_name_is_reused(self):
+        place = Place()
+        name = PlaceName()
+        name.set_value("Newton")
+        place.set_name(name)
+        place.set_type(PlaceType.VILLAGE)
+        with DbTxn("Add place", self.db) as trans:
+            handle = self.db.add_place(place, trans)
+
+        PlaceImporter(self.db).run(NEWTONS, 0)
+        places = {place.get_handle(): place for place in self.get_places("Newton")}
+        self.assertEqual(len(places), 3)
+        self.assertEqual(PlaceIndex.get_gbpn_ids(places[handle]), {"1"})
+
+    def test_failed_chunk_leaves_no_places_in_the_index(self):
+        importer = PlaceImporter(self.db)
+        add_place = self.db.add_place
+        calls = []
+
+        def fail_on_fifth_place(place, trans, *args):
+            calls.append(place)
+            if len(calls) == 5:
+                raise RuntimeError("disk full")
+            return add_place(place, trans, *args)
+
+        self.db.add_place = fail_on_fifth_place
+        with self.assertRaises(RuntimeError):
+            importer.run(NEWTONS, 0)
+        self.db.add_place = add_place
+        self.assertEqual(self.get_places("Newton"), [])
+
+        # The same index is used again, as by the Gramplet
+        importer.run(NEWTONS, 0)
+        self.assertEqual(len(self.get_places("Newton")), 3)
+        self.assertEqual(
+            importer.place_index.find("England", PlaceType.COUNTRY),
+            self.get_places("England")[0].get_handle(),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
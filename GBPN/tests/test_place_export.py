@@ -0,0 +1,107 @@
+"""
+Tests for exporting imported places with their enclosing places by period.
+
+Run from the repository root with Gramps importable:
+
+    python -m pytest GBPN/tests
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from gramps.gen.db import DbTxn  # noqa: E402
+from gramps.gen.lib import PlaceRef  # noqa: E402
+
+from gazetteer import GazetteerRow  # noqa: E402
+from importer import PlaceImporter  # noqa: E402
+from place_export import PlaceExporter  # noqa: E402
+from test_importer import DatabaseTestCase  # noqa: E402
+
+
+def make_row(gbpn_id: str, name: str, parish: str) -> GazetteerRow:
+    return GazetteerRow(
+        GBPNID=gbpn_id,
+        PlaceName=name,
+        GBPN_URL=f"https://gbnames.example/place/{gbpn_id}",
+        Region="North West",
+        HistCounty="Cheshire",
+        AdCounty="Cheshire",
+        District="Chester Rural",
+        UniAuth="Cheshire West and Chester",
+        CivilParish=parish,
+        Alternative_Name="",
+        Type="Village",
+        NameType="P",
+        Lat="53.21",
+        Lng="-2.88",
+    )
+
+
+ROWS = [
+    make_row("1", "Guilden Sutton", "Guilden Sutton CP"),
+    make_row("2", "Mickle Trafford", "Mickle Trafford and District CP"),
+]
+
+ADMINISTRATIVE = (
+    "United Kingdom",
+    "North West",
+    "Cheshire",
+    "Chester Rural",
+    "Guilden Sutton CP",
+)
+MODERN = (
+    "United Kingdom",
+    "North West",
+    "Cheshire West and Chester",
+    "Guilden Sutton CP",
+)
+
+
+class PlaceExporterTest(DatabaseTestCase):
+    def export(self) -> dict[str, dict[str, list[tuple[str, ...]]]]:
+        return {
+            place.gbpn_ids[0]: place.chains
+            for place in PlaceExporter(self.db).iter_places()
+        }
+
+    def test_parish_has_a_chain_for_each_period(self):
+        PlaceImporter(self.db).run(ROWS, 0)
+        chains = self.export()["1"]
+        self.assertEqual(
+            chains["historic"], [("United Kingdom", "North West", "Cheshire")]
+        )
+        self.assertEqual(chains["administrative"], [ADMINISTRATIVE])
+        self.assertEqual(chains["modern"], [MODERN])
+        self.assertEqual(chains["other"], [])
+
+    def test_undated_parish_references_are_dated_on_import(self):
+        # Earlier imports left a parish with undated references to its district
+        # and unitary authority
+        PlaceImporter(self.db).run(ROWS[:1], 0)
+        parish = next(iter(self.get_places("Guilden Sutton CP")))
+        refs = []
+        for ref in parish.get_placeref_list():
+            undated = PlaceRef()
+            undated.set_reference_handle(ref.ref)
+            refs.append(undated)
+        parish.set_placeref_list(refs)
+        with DbTxn("Undate parish", self.db) as trans:
+            self.db.commit_place(parish, trans)
+
+        PlaceImporter(self.db).run(ROWS, 0)
+        chains = self.export()
+        for gbpn_id in ("1", "2"):
+            self.assertNotEqual(
+                chains[gbpn_id]["administrative"], chains[gbpn_id]["modern"]
+            )
+        self.assertEqual(chains["1"]["modern"], [MODERN])
+        parish = next(iter(self.get_places("Guilden Sutton CP")))
+        self.assertEqual(len(parish.get_placeref_list()), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+"""
+Tests for matching untagged places to gazetteer places with duplicate names.
+
+Run from the repository root with Gramps importable:
+
+    python -m pytest GBPN/tests
+"""
+
+import sys
+import unittest
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from csv_ranges import normalize_name  # noqa: E402
+from gazetteer import GazetteerRow  # noqa: E402
+from place_matcher import (  # noqa: E402
+    ALTERNATIVE_NAME_WEIGHT,
+    COUNTY_WEIGHT,
+    NAME_WEIGHT,
+    PlaceMatcher,
+    UntaggedPlace,
+)
+from spatial import get_distance, parse_coordinates  # noqa: E402
+
+
+def make_row(
+    gbpn_id: str,
+    name: str,
+    county: str,
+    district: str,
+    parish: str = "",
+    lat: str = "",
+    lng: str = "",
+    alternative_names: str = "",
+) -> GazetteerRow:
+    return GazetteerRow(
+        GBPNID=gbpn_id,
+        PlaceName=name,
+        GBPN_URL="",
+        Region="England",
+        HistCounty=county,
+        AdCounty=county,
+        District=district,
+        UniAuth="",
+        CivilParish=parish,
+        Alternative_Name=alternative_names,
+        Type="Village",
+        NameType="P",
+        Lat=lat,
+        Lng=lng,
+    )
+
+
+ROWS = [
+    make_row("1", "Newton", "Norfolk", "Breckland", "Castle Acre CP", "52.70", "0.69"),
+    make_row("2", "Newton", "Yorkshire", "Ryedale", "Newton CP", "54.27", "-0.80"),
+    make_row(
+        "3",
+        "Newton",
+        "Cheshire",
+        "Cheshire West and Chester",
+        lat="53.21",
+        lng="-2.88",
+        alternative_names="Newton by Chester",
+    ),
+    make_row("4", "Thorpe Willoughby", "Yorkshire", "Selby", "Thorpe Willoughby CP"),
+]
+
+
+class FakeGazetteer:
+    """
+    The name and position lookups of a gazetteer holding ``rows``.
+    """
+
+    def __init__(self, rows: list[GazetteerRow]):
+        self.rows = rows
+
+    def find_names(self, names) -> dict[str, list[GazetteerRow]]:
+        keys = {normalize_name(name) for name in names}
+        found = {}
+        for row in self.rows:
+            for name in (row.PlaceName, *row.Alternative_Name.split(",")):
+                key = normalize_name(name)
+                if key in keys and row not in found.get(key, []):
+                    found.setdefault(key, []).append(row)
+        return found
+
+    def find_nearest(self, lat, lng, limit, max_distance):
+        nearest = []
+        for row in self.rows:
+            coordinates = parse_coordinates(row.Lat, row.Lng)
+            if coordinates is not None:
+                distance = get_distance(lat, lng, *coordinates)
+                if distance <= max_distance:
+                    nearest.append((distance, row))
+        return sorted(nearest)[:limit]
+
+
+def make_place(
+    title: str, coordinates: Optional[tuple[float, float]] = None
+) -> UntaggedPlace:
+    """
+    Return an untagged place named ``title``, whose parts after the first comma
+    are its context, as for a place typed in by hand.
+    """
+    name, *context = title.split(",")
+    return UntaggedPlace(
+        handle=title,
+        title=title,
+        names=frozenset({normalize_name(name)}),
+        context=frozenset(normalize_name(part) for part in context),
+        coordinates=coordinates,
+    )
+
+
+class PlaceMatcherTest(unittest.TestCase):
+    def match(
+        self, place: UntaggedPlace, rows: list[GazetteerRow] = ROWS, **options
+    ) -> tuple[PlaceMatcher, list]:
+        matcher = PlaceMatcher(FakeGazetteer(rows), **options)
+        return matcher, list(matcher.iter_matches([place]))
+
+    def test_county_picks_one_of_duplicate_names(self):
+        matcher, matches = self.match(make_place("Newton, Norfolk, England"))
+        self.assertEqual([match.row.GBPNID for match in matches], ["1"])
+        self.assertAlmostEqual(matches[0].score, NAME_WEIGHT + COUNTY_WEIGHT)
+
+    def test_duplicate_names_in_a_county_are_ambiguous(self):
+        rows = ROWS + [
+            make_row("5", "Newton", "Norfolk", "South Norfolk", "Newton Flotman CP")
+        ]
+        matcher, matches = self.match(make_place("Newton, Norfolk, England"), rows)
+        self.assertEqual(matches, [])
+        self.assertEqual(matcher.counters["ambiguous"], 1)
+
+    def test_region_is_not_county_evidence(self):
+        matcher, matches = self.match(make_place("Thorpe Willoughby, Norfolk, England"))
+        self.assertEqual(matches, [])
+        self.assertEqual(matcher.counters["unmatched"], 1)
+
+    def test_duplicate_name_alone_is_not_matched(self):
+        matcher, matches = self.match(make_place("Newton"))
+        self.assertEqual(matches, [])
+        self.assertEqual(matcher.counters["unmatched"], 1)
+
+    def test_position_picks_one_of_duplicate_names(self):
+        matcher, matches = self.match(make_place("Newton", (53.211, -2.88)))
+        self.assertEqual([match.row.GBPNID for match in matches], ["3"])
+        self.assertLess(matches[0].distance, 0.2)
+
+    def test_alternative_name_and_county(self):
+        matcher, matches = self.match(make_place("Newton by Chester, Cheshire"))
+        self.assertEqual([match.row.GBPNID for match in matches], ["3"])
+        self.assertAlmostEqual(
+            matches[0].score, ALTERNATIVE_NAME_WEIGHT + COUNTY_WEIGHT
+        )
+
+    def test_tagged_places_are_not_matched_again(self):
+        matcher, matches = self.match(make_place("Newton, Yorkshire"), tagged_ids=["2"])
+        self.assertEqual(matches, [])
+        self.assertEqual(matcher.counters["unmatched"], 1)
+
+    def test_candidates_too_far_away_are_rejected(self):
+        # Named as the Cheshire place, but in Norfolk
+        matcher, matches = self.match(make_place("Newton, Cheshire", (52.70, 0.69)))
+        self.assertNotIn("3", [match.row.GBPNID for match in matches])
+
+
+if __name__ == "__main__":
+    unittest.main()